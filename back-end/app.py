@@ -3,11 +3,33 @@ Flask API for invoice extractor.
 Provides endpoints for managing sales orders.
 """
 
+import base64
+import os
+import sys
+import tempfile
+from collections.abc import Mapping
 from datetime import datetime
 
+import orjson
+import pydantic
+
+from celery.result import AsyncResult
 from db import get_db_session
-from document_processor import ALLOWED_EXTENSIONS, ALLOWED_MIME_TYPES, MAX_FILE_SIZE
-from flask import Flask, abort, jsonify, request
+from document_processor import (
+    ALLOWED_EXTENSIONS,
+    ALLOWED_MIME_TYPES,
+    MAX_FILE_SIZE,
+)
+from flask import (
+    Flask,
+    Response,
+    abort,
+    jsonify,
+    request,
+    stream_with_context,
+    url_for,
+)
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from models import (
     Customer,
@@ -17,13 +39,104 @@ from models import (
     SalesOrderHeader,
     StoreCustomer,
 )
-from openai_full_data_extraction import extract_invoice_data_from_document
-from sqlalchemy import or_
+from schemas import (
+    SalesOrderCreate,
+    SalesOrderDetailCreate,
+    SalesOrderDetailUpdate,
+    SalesOrderUpdate,
+)
+from sqlalchemy import Select, delete, func, lambda_stmt, or_, select, text, tuple_
 from sqlalchemy.orm import joinedload
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import FileTarget
+from streaming_form_data.validators import MaxSizeValidator, ValidationError
+from tasks import UPLOAD_FOLDER, celery_app, extract_task
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider that encodes responses with orjson instead of the stdlib json module.
+    Datetimes are serialized as ISO 8601 strings and numpy values natively.
+    """
+
+    # Serialize numpy scalars/arrays (e.g. from pandas) without conversion
+    options = orjson.OPT_SERIALIZE_NUMPY
+
+    @staticmethod
+    def default(obj):
+        """
+        Fallback for types orjson does not serialize natively.
+
+        Args:
+            obj: Object to serialize
+
+        Returns:
+            A JSON-serializable representation of obj
+        """
+        if isinstance(obj, Mapping):
+            return dict(obj)
+        return str(obj)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.options),
+            mimetype="application/json",
+        )
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 
+# Size of the chunks read from the request body while streaming uploads
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Reject bodies that can't hold a valid upload before any of it is read
+app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE + MULTIPART_OVERHEAD
+
+# Number of rows fetched from the database at a time for streamed responses
+STREAM_BATCH_SIZE = 50
+
+# Columns returned by the sales order list endpoint
+_HEADER_COLUMNS = tuple(SalesOrderHeader.__table__.columns)
+
+# Columns returned by the product search endpoint
+_PRODUCT_COLUMNS = tuple(Product.__table__.columns)
+_PRODUCT_FIELDS = tuple(column.key for column in _PRODUCT_COLUMNS)
+
+# Detail columns nested in a single sales order (SalesOrderID is implied)
+_NESTED_DETAIL_COLUMNS = tuple(
+    column
+    for column in SalesOrderDetail.__table__.columns
+    if column.key != "SalesOrderID"
+)
+_NESTED_DETAIL_FIELDS = tuple(column.key for column in _NESTED_DETAIL_COLUMNS)
+
+# Fields serialized for sales order headers and details, in response order
+_HEADER_FIELDS = tuple(column.key for column in _HEADER_COLUMNS)
+_DETAIL_FIELDS = tuple(column.key for column in SalesOrderDetail.__table__.columns)
+
+# Sortable sales order fields mapped to their columns
+_ALLOWED_SORT_COLUMNS = {
+    field: getattr(SalesOrderHeader, field) for field in _HEADER_FIELDS
+}
+
+# Sales order header fields holding datetimes
+_HEADER_DATE_FIELDS = frozenset({"OrderDate", "DueDate", "ShipDate"})
+
+# datetime.fromisoformat accepts the "Z" UTC suffix from Python 3.11 onwards
+_FROMISO_HANDLES_Z = sys.version_info >= (3, 11)
+
 
 def product_to_dict(product: Product) -> dict:
     """
@@ -53,96 +166,318 @@ def product_to_dict(product: Product) -> dict:
     }
 
 
+def order_header_to_dict(order: SalesOrderHeader) -> dict:
+    """
+    Convert a SalesOrderHeader model instance to a dictionary with all header fields.
+    Datetime fields are left as datetime objects and encoded by the JSON provider.
+
+    Args:
+        order: SalesOrderHeader model instance
+
+    Returns:
+        dict: Dictionary containing all sales order header fields
+    """
+    return {field: getattr(order, field) for field in _HEADER_FIELDS}
+
+
+def order_detail_to_dict(
+    detail: SalesOrderDetail, include_order_id: bool = True
+) -> dict:
+    """
+    Convert a SalesOrderDetail model instance to a dictionary with all detail fields
+    and, if loaded, the related product.
+
+    Args:
+        detail: SalesOrderDetail model instance
+        include_order_id: Whether to include SalesOrderID (omitted when nested
+            in a sales order)
+
+    Returns:
+        dict: Dictionary containing all sales order detail fields
+    """
+    detail_dict = {field: getattr(detail, field) for field in _DETAIL_FIELDS}
+    if not include_order_id:
+        del detail_dict["SalesOrderID"]
+
+    # Add product information if available
+    if detail.product:
+        detail_dict["Product"] = product_to_dict(detail.product)
+
+    return detail_dict
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parse an ISO 8601 datetime string, accepting a trailing "Z" for UTC.
+
+    Args:
+        value: ISO 8601 datetime string
+
+    Returns:
+        datetime: Parsed datetime
+
+    Raises:
+        ValueError: If value is not a valid ISO 8601 datetime
+    """
+    if _FROMISO_HANDLES_Z:
+        return datetime.fromisoformat(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _join_page_ids(stmt: Select, page_ids: Select) -> Select:
+    """
+    Join a sales order header select to the SalesOrderIDs of a single page.
+
+    Args:
+        stmt: Select over the sales order header columns
+        page_ids: Ordered and limited select of SalesOrderIDs for the page
+
+    Returns:
+        Select: stmt restricted to the rows of the page
+    """
+    page_ids = page_ids.subquery()
+    return stmt.join(page_ids, SalesOrderHeader.SalesOrderID == page_ids.c.SalesOrderID)
+
+
+def conditional_json(data) -> Response:
+    """
+    Build a JSON response with an ETag and answer 304 Not Modified if it
+    matches the request's If-None-Match header.
+
+    Args:
+        data: JSON-serializable response data
+
+    Returns:
+        Response: 200 response with the body, or 304 without it
+    """
+    response = jsonify(data)
+    # Content hash, since sales orders can change without a RevisionNumber bump
+    response.add_etag()
+    # Let clients keep the body but always revalidate, so edits show up immediately
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+def parse_request_body(schema: type[pydantic.BaseModel]) -> dict:
+    """
+    Parse and validate the JSON request body against a schema.
+    Aborts with 400 if the body is not valid JSON or fails validation.
+
+    Args:
+        schema: Pydantic model describing the expected body
+
+    Returns:
+        dict: Fields present in the request body, converted to their schema types
+    """
+    if not request.is_json:
+        abort(400, description="Request body must be JSON")
+
+    try:
+        body = schema.model_validate_json(request.get_data())
+    except pydantic.ValidationError as e:
+        error = e.errors()[0]
+        if not error["loc"]:
+            abort(400, description="Request body must be a valid JSON object")
+        field = ".".join(str(part) for part in error["loc"])
+        if error["type"] == "missing":
+            abort(400, description=f"{field} is required")
+        abort(400, description=f"Invalid value for {field}: {error['msg']}")
+
+    # Only fields that were actually sent, so updates leave the rest untouched
+    return body.model_dump(exclude_unset=True)
+
+
+def encode_cursor(order: Mapping, sort_by: str) -> str:
+    """
+    Encode the keyset position of a sales order as an opaque pagination cursor.
+
+    Args:
+        order: Last sales order header row of the current page
+        sort_by: Name of the field the results are sorted by
+
+    Returns:
+        str: URL-safe base64-encoded cursor
+    """
+    # orjson writes datetimes as ISO 8601, which decode_cursor parses back
+    payload = orjson.dumps([order[sort_by], order["SalesOrderID"]])
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str, sort_by: str) -> tuple:
+    """
+    Decode a pagination cursor produced by encode_cursor.
+
+    Args:
+        cursor: URL-safe base64-encoded cursor
+        sort_by: Name of the field the results are sorted by
+
+    Returns:
+        tuple: (last sort value, last SalesOrderID)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        value, last_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_by in _HEADER_DATE_FIELDS and value is not None:
+            value = parse_datetime(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    return value, last_id
+
+
 @app.route("/upload", methods=["POST"])
 def upload_invoice():
     """
-    Upload and process an invoice document.
+    Upload an invoice document and enqueue it for processing.
 
     Accepts multipart/form-data with a file field.
     Supported formats: PDF, PNG, JPG
 
     Returns:
-        JSON object containing extracted invoice data with header and line_items.
+        JSON object containing the job_id of the extraction task with 202 status code.
+        Poll GET /jobs/<job_id> for the extracted invoice data.
         Returns 400 for invalid requests, 413 for file too large,
-        415 for unsupported type, 500 for processing errors.
+        415 for unsupported type.
     """
-    # Check if file is present
-    if "file" not in request.files:
-        abort(400, description="No file provided in request")
+    if request.mimetype != "multipart/form-data":
+        abort(400, description="Request body must be multipart/form-data")
+
+    # Fail fast on the declared size, before spooling anything to disk
+    max_size_mb = MAX_FILE_SIZE / 1024 / 1024
+    if (
+        request.content_length
+        and request.content_length > MAX_FILE_SIZE + MULTIPART_OVERHEAD
+    ):
+        abort(413, description=f"File too large. Maximum size: {max_size_mb}MB")
 
-    file = request.files["file"]
+    # Stream the file field straight to disk instead of buffering it in memory
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER)
+    os.close(fd)
 
-    # Check if file was actually selected
-    if file.filename == "" or not file.filename:
-        abort(400, description="No file selected")
+    try:
+        target = FileTarget(
+            tmp_path, allow_overwrite=True, validator=MaxSizeValidator(MAX_FILE_SIZE)
+        )
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register("file", target)
 
-    # Check if file extension is allowed
-    allow_file = (
-        "." in file.filename
-        and file.filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
-    )
+        try:
+            while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+                parser.data_received(chunk)
+        except ValidationError:
+            abort(413, description=f"File too large. Maximum size: {max_size_mb}MB")
 
-    # Validate file extension
-    if not allow_file:
-        allowed_types = ", ".join(ALLOWED_EXTENSIONS)
-        abort(415, description=f"Unsupported file type. Allowed types: {allowed_types}")
+        filename = target.multipart_filename
+        content_type = target.multipart_content_type
 
-    # Check file size
-    file.seek(0, 2)  # Seek to end
-    file_size = file.tell()
-    file.seek(0)  # Reset to beginning
+        # Check if file is present
+        if filename is None:
+            abort(400, description="No file provided in request")
 
-    if file_size > MAX_FILE_SIZE:
-        max_size_mb = MAX_FILE_SIZE / 1024 / 1024
-        abort(413, description=f"File too large. Maximum size: {max_size_mb}MB")
+        # Check if file was actually selected
+        if not filename:
+            abort(400, description="No file selected")
 
-    # Validate MIME type
-    if hasattr(file, "content_type") and file.content_type:
-        if file.content_type not in ALLOWED_MIME_TYPES:
+        # Check if file extension is allowed
+        allow_file = (
+            "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+        )
+
+        # Validate file extension
+        if not allow_file:
+            allowed_types = ", ".join(ALLOWED_EXTENSIONS)
             abort(
                 415,
-                description=f"Unsupported MIME type: {file.content_type}",
+                description=f"Unsupported file type. Allowed types: {allowed_types}",
             )
 
-    try:
-        # Process the document and extract structured invoice data
-        extracted_data = extract_invoice_data_from_document(file, file.filename)
-        print(extracted_data)
-        return jsonify(extracted_data), 200
+        # Validate MIME type
+        if content_type and content_type not in ALLOWED_MIME_TYPES:
+            abort(415, description=f"Unsupported MIME type: {content_type}")
+
+        # Hand the spooled document off to the OCR/LLM workers
+        task = extract_task.delay(tmp_path, filename)
+
+    except Exception:
+        # Discard the spooled upload on a validation failure, a malformed body or
+        # an unreachable broker; once enqueued, the worker removes it
+        os.remove(tmp_path)
+        raise
+
+    return jsonify({"job_id": task.id, "status": task.status}), 202
+
 
-    except ValueError as e:
-        # Handle processing errors (OCR, API, parsing)
-        abort(500, description=f"Error processing document: {str(e)}")
-    except Exception as e:
-        # Handle unexpected errors
-        abort(500, description=f"Unexpected error: {str(e)}")
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Retrieves the status and result of an invoice extraction job.
+
+    Args:
+        job_id: The job_id returned by POST /upload
+
+    Returns:
+        JSON object containing the job_id and status. Returns 200 with the
+        extracted invoice data (header and line_items) in result once the job
+        has finished, 202 while it is still pending or running, and 500 if
+        processing failed.
+    """
+    result = AsyncResult(job_id, app=celery_app)
+
+    if result.successful():
+        return (
+            jsonify(
+                {"job_id": job_id, "status": result.status, "result": result.result}
+            ),
+            200,
+        )
+
+    if result.failed():
+        abort(500, description=f"Error processing document: {str(result.result)}")
+
+    return jsonify({"job_id": job_id, "status": result.status}), 202
 
 
 @app.route("/sales_orders", methods=["GET"])
 def get_sales_orders():
     """
     Lists stored sales orders (header info) with pagination and sorting.
+    The response is streamed as rows are read from the database.
 
     Query Parameters:
-        page (int): Page number (default: 1, minimum: 1)
-        per_page (int): Number of items per page (default: 10, minimum: 1, maximum: 100)
+        page (int): Page number (default: 1, minimum: 1). OFFSET-based, so deep
+            pages get slower as the table grows - prefer cursor for large tables.
+        cursor (str): Keyset cursor returned as next_cursor by the previous page.
+            When provided, page is ignored and the page is fetched with an index
+            seek. Rows whose sort field is null are not reachable via cursors.
+        after_id (int): Return orders with a SalesOrderID greater than this value.
+            Shorthand for a cursor when sorting by SalesOrderID ascending; pass
+            next_after_id from the previous page to fetch the next one.
+        per_page (int): Number of items per page (default: 10, minimum: 1, maximum: 100).
+            limit is accepted as an alias.
         sort_by (str): Field to sort by (default: SalesOrderID). Valid fields:
             SalesOrderID, OrderDate, DueDate, ShipDate, Status, SalesOrderNumber,
             PurchaseOrderNumber, AccountNumber, CustomerID, SalesPersonID, TerritoryID,
             SubTotal, TaxAmt, Freight, TotalDue
         order (str): Sort order - 'asc' or 'desc' (default: 'asc')
+        estimated (bool): Use the planner's row estimate for the total instead of an
+            exact count - 'true' or 'false' (default: 'false'). Only honoured on PostgreSQL.
 
     Returns:
         JSON object containing:
             - data: Array of sales order headers with all header fields
-            - pagination: Object with pagination metadata (page, per_page, total, total_pages, has_next, has_prev)
+            - pagination: Object with pagination metadata (page, per_page, total, total_pages, has_next, has_prev, next_cursor, next_after_id, next)
+              With cursor or after_id, total and total_pages are null: the count
+              is skipped so each page costs O(per_page) regardless of table size.
     """
     # Get pagination parameters from query string
     try:
         page = int(request.args.get("page", 1))
-        per_page = int(request.args.get("per_page", 10))
+        per_page = int(request.args.get("per_page", request.args.get("limit", 10)))
+        after_id = request.args.get("after_id")
+        after_id = int(after_id) if after_id is not None else None
     except (ValueError, TypeError):
-        abort(400, description="page and per_page must be valid integers")
+        abort(400, description="page, per_page and after_id must be valid integers")
 
     # Validate pagination parameters
     if page < 1:
@@ -156,110 +491,188 @@ def get_sales_orders():
     sort_by = request.args.get("sort_by", "SalesOrderID")
     order = request.args.get("order", "asc").lower()
 
-    # Define allowed sortable fields
-    allowed_sort_fields = {
-        "SalesOrderID",
-        "RevisionNumber",
-        "OrderDate",
-        "DueDate",
-        "ShipDate",
-        "Status",
-        "OnlineOrderFlag",
-        "SalesOrderNumber",
-        "PurchaseOrderNumber",
-        "AccountNumber",
-        "CustomerID",
-        "SalesPersonID",
-        "TerritoryID",
-        "BillToAddressID",
-        "ShipToAddressID",
-        "ShipMethodID",
-        "CreditCardID",
-        "CreditCardApprovalCode",
-        "CurrencyRateID",
-        "SubTotal",
-        "TaxAmt",
-        "Freight",
-        "TotalDue",
-    }
-
     # Validate sort field
-    if sort_by not in allowed_sort_fields:
+    if sort_by not in _ALLOWED_SORT_COLUMNS:
         abort(
             400,
-            description=f"Invalid sort_by field. Allowed fields: {', '.join(sorted(allowed_sort_fields))}",
+            description=f"Invalid sort_by field. Allowed fields: {', '.join(sorted(_ALLOWED_SORT_COLUMNS))}",
         )
 
     # Validate order direction
     if order not in ("asc", "desc"):
         abort(400, description="order must be 'asc' or 'desc'")
 
-    with get_db_session() as session:
-        # Get total count for pagination metadata
-        total = session.query(SalesOrderHeader).count()
-
-        # Calculate pagination
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 0
-        offset = (page - 1) * per_page
-
-        # Get the sort column from the model
-        sort_column = getattr(SalesOrderHeader, sort_by)
-
-        # Apply ordering (descending if order is 'desc')
+    estimated = request.args.get("estimated", "false").lower() == "true"
+
+    # Decode keyset cursor, if provided
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort_by)
+        except ValueError as e:
+            abort(400, description=str(e))
+    elif after_id is not None:
+        # after_id is a cursor on SalesOrderID alone
+        if sort_by != "SalesOrderID" or order != "asc":
+            abort(
+                400,
+                description="after_id requires sort_by=SalesOrderID and order=asc; "
+                "use cursor for other orderings",
+            )
+        last_value = last_id = after_id
+    keyset = bool(cursor) or after_id is not None
+
+    offset = (page - 1) * per_page
+
+    # Get the sort column from the model
+    sort_column = _ALLOWED_SORT_COLUMNS[sort_by]
+    id_column = SalesOrderHeader.SalesOrderID
+
+    # Statements are built with lambda_stmt so that, after the first request
+    # for a given sort field and direction, SQLAlchemy reuses the cached
+    # statement and only extracts the new parameter values.
+    # SalesOrderID is a tie-breaker in the same direction as the sort field so
+    # the order is stable for cursors.
+    if keyset:
+        # Keyset pagination: seek past the last row of the previous page
+        stmt = lambda_stmt(lambda: select(*_HEADER_COLUMNS))
         if order == "desc":
-            sort_column = sort_column.desc()
-
-        # Query with pagination and sorting
-        orders = (
-            session.query(SalesOrderHeader)
-            .order_by(sort_column)
-            .order_by(SalesOrderHeader.SalesOrderID.desc())
-            .offset(offset)
-            .limit(per_page)
-            .all()
+            stmt += lambda s: s.where(
+                tuple_(sort_column, id_column) < tuple_(last_value, last_id)
+            ).order_by(sort_column.desc(), id_column.desc())
+        else:
+            stmt += lambda s: s.where(
+                tuple_(sort_column, id_column) > tuple_(last_value, last_id)
+            ).order_by(sort_column, id_column)
+    else:
+        # Deferred join: walk the OFFSET over the narrow key columns only,
+        # then fetch full rows for the returned slice
+        stmt = lambda_stmt(
+            lambda: select(*_HEADER_COLUMNS).select_from(SalesOrderHeader)
         )
-
-        # Convert orders to dictionaries
-        orders_data = []
-        for order in orders:
-            order_dict = {
-                "SalesOrderID": order.SalesOrderID,
-                "RevisionNumber": order.RevisionNumber,
-                "OrderDate": order.OrderDate.isoformat() if order.OrderDate else None,
-                "DueDate": order.DueDate.isoformat() if order.DueDate else None,
-                "ShipDate": order.ShipDate.isoformat() if order.ShipDate else None,
-                "Status": order.Status,
-                "OnlineOrderFlag": order.OnlineOrderFlag,
-                "SalesOrderNumber": order.SalesOrderNumber,
-                "PurchaseOrderNumber": order.PurchaseOrderNumber,
-                "AccountNumber": order.AccountNumber,
-                "CustomerID": order.CustomerID,
-                "SalesPersonID": order.SalesPersonID,
-                "TerritoryID": order.TerritoryID,
-                "BillToAddressID": order.BillToAddressID,
-                "ShipToAddressID": order.ShipToAddressID,
-                "ShipMethodID": order.ShipMethodID,
-                "CreditCardID": order.CreditCardID,
-                "CreditCardApprovalCode": order.CreditCardApprovalCode,
-                "CurrencyRateID": order.CurrencyRateID,
-                "SubTotal": order.SubTotal,
-                "TaxAmt": order.TaxAmt,
-                "Freight": order.Freight,
-                "TotalDue": order.TotalDue,
+        if order == "desc":
+            stmt += lambda s: _join_page_ids(
+                s,
+                select(id_column)
+                .order_by(sort_column.desc(), id_column.desc())
+                .offset(offset)
+                .limit(per_page),
+            ).order_by(sort_column.desc(), id_column.desc())
+        else:
+            stmt += lambda s: _join_page_ids(
+                s,
+                select(id_column)
+                .order_by(sort_column, id_column)
+                .offset(offset)
+                .limit(per_page),
+            ).order_by(sort_column, id_column)
+    # Keyset pages fetch one extra row to tell whether a next page exists
+    fetch_limit = per_page + 1 if keyset else per_page
+    stmt += lambda s: s.limit(fetch_limit)
+
+    def generate():
+        with get_db_session() as session:
+            # Get total count for pagination metadata
+            # Keyset pages skip it; counting is a full index scan per page
+            if keyset:
+                total = None
+            elif estimated and session.get_bind().dialect.name == "postgresql":
+                # reltuples is -1 until the table has been vacuumed/analyzed
+                total = max(
+                    int(
+                        session.execute(
+                            text(
+                                "SELECT reltuples FROM pg_class WHERE relname = :table"
+                            ),
+                            {"table": SalesOrderHeader.__tablename__},
+                        ).scalar()
+                        or 0
+                    ),
+                    0,
+                )
+            else:
+                # Flat SELECT count(...) so the planner can use the primary key index
+                total = session.query(
+                    func.count(SalesOrderHeader.SalesOrderID)
+                ).scalar()
+
+            # Calculate pagination
+            if total is None:
+                total_pages = None
+            else:
+                total_pages = (total + per_page - 1) // per_page if total > 0 else 0
+
+            # Stream plain rows instead of ORM instances; dates are serialized by orjson
+            rows = session.execute(
+                stmt,
+                execution_options={
+                    "stream_results": True,
+                    "yield_per": STREAM_BATCH_SIZE,
+                },
+            ).mappings()
+
+            count = 0
+            last_order = None
+            has_more = False
+
+            yield '{"data": ['
+            for row in rows:
+                # The extra keyset row is only a lookahead
+                if count == per_page:
+                    has_more = True
+                    break
+                last_order = row
+                yield ("," if count else "") + app.json.dumps(last_order)
+                count += 1
+
+            # Build pagination metadata
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "total_pages": total_pages,
+                # Keyset pages are never the first page and use the lookahead row
+                "has_next": has_more if keyset else page < total_pages,
+                "has_prev": keyset or page > 1,
+                "next_cursor": (
+                    encode_cursor(last_order, sort_by) if last_order else None
+                ),
+                "next_after_id": None,
             }
-            orders_data.append(order_dict)
 
-        # Build pagination metadata
-        pagination = {
-            "page": page,
-            "per_page": per_page,
-            "total": total,
-            "total_pages": total_pages,
-            "has_next": page < total_pages,
-            "has_prev": page > 1,
-        }
+            # after_id only applies when paging by SalesOrderID ascending
+            if last_order and sort_by == "SalesOrderID" and order == "asc":
+                pagination["next_after_id"] = last_order["SalesOrderID"]
+
+            # Link to the next page, in the same pagination mode as this one
+            pagination["next"] = None
+            if pagination["has_next"]:
+                if after_id is not None and not cursor:
+                    pagination["next"] = url_for(
+                        "get_sales_orders",
+                        after_id=pagination["next_after_id"],
+                        limit=per_page,
+                    )
+                elif keyset:
+                    pagination["next"] = url_for(
+                        "get_sales_orders",
+                        cursor=pagination["next_cursor"],
+                        per_page=per_page,
+                        sort_by=sort_by,
+                        order=order,
+                    )
+                else:
+                    pagination["next"] = url_for(
+                        "get_sales_orders",
+                        page=page + 1,
+                        per_page=per_page,
+                        sort_by=sort_by,
+                        order=order,
+                    )
+
+            yield '], "pagination": ' + app.json.dumps(pagination) + "}"
 
-        return jsonify({"data": orders_data, "pagination": pagination}), 200
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 
 @app.route("/sales_orders", methods=["POST"])
@@ -276,103 +689,18 @@ def create_sales_order():
         JSON object containing the created sales order header with 201 status code.
         Returns 400 for invalid requests.
     """
-    if not request.is_json:
-        abort(400, description="Request body must be JSON")
-
-    data = request.get_json()
-    print("data", data)
-
-    # Validate required fields
-    if "CustomerID" not in data:
-        abort(400, description="CustomerID is required")
-    if "TerritoryID" not in data:
-        abort(400, description="TerritoryID is required")
+    data = parse_request_body(SalesOrderCreate)
 
     with get_db_session() as session:
-        # Create new order
-        order = SalesOrderHeader()
-
-        # Set SalesOrderID only if explicitly provided (otherwise SQLite auto-assigns)
-        if "SalesOrderID" in data:
-            order.SalesOrderID = data["SalesOrderID"]
-
-        order.CustomerID = data["CustomerID"]
-        order.TerritoryID = data["TerritoryID"]
-
-        # Handle optional fields
-        optional_fields = [
-            "RevisionNumber",
-            "OrderDate",
-            "DueDate",
-            "ShipDate",
-            "Status",
-            "OnlineOrderFlag",
-            "SalesOrderNumber",
-            "PurchaseOrderNumber",
-            "AccountNumber",
-            "SalesPersonID",
-            "BillToAddressID",
-            "ShipToAddressID",
-            "ShipMethodID",
-            "CreditCardID",
-            "CreditCardApprovalCode",
-            "CurrencyRateID",
-            "SubTotal",
-            "TaxAmt",
-            "Freight",
-            "TotalDue",
-        ]
-
-        for field in optional_fields:
-            if field in data:
-                value = data[field]
-
-                # Handle datetime fields
-                if field in ["OrderDate", "DueDate", "ShipDate"]:
-                    if value is not None:
-                        try:
-                            if isinstance(value, str):
-                                value = datetime.fromisoformat(
-                                    value.replace("Z", "+00:00")
-                                )
-                        except (ValueError, AttributeError):
-                            abort(
-                                400,
-                                description=f"Invalid date format for {field}. "
-                                "Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-                            )
-
-                setattr(order, field, value)
+        # Create new order. SalesOrderID is only set if explicitly provided
+        # (otherwise SQLite auto-assigns)
+        order = SalesOrderHeader(**data)
 
         session.add(order)
         session.flush()  # Flush to get the auto-generated ID
 
         # Build response with created order data
-        order_data = {
-            "SalesOrderID": order.SalesOrderID,
-            "RevisionNumber": order.RevisionNumber,
-            "OrderDate": order.OrderDate.isoformat() if order.OrderDate else None,
-            "DueDate": order.DueDate.isoformat() if order.DueDate else None,
-            "ShipDate": order.ShipDate.isoformat() if order.ShipDate else None,
-            "Status": order.Status,
-            "OnlineOrderFlag": order.OnlineOrderFlag,
-            "SalesOrderNumber": order.SalesOrderNumber,
-            "PurchaseOrderNumber": order.PurchaseOrderNumber,
-            "AccountNumber": order.AccountNumber,
-            "CustomerID": order.CustomerID,
-            "SalesPersonID": order.SalesPersonID,
-            "TerritoryID": order.TerritoryID,
-            "BillToAddressID": order.BillToAddressID,
-            "ShipToAddressID": order.ShipToAddressID,
-            "ShipMethodID": order.ShipMethodID,
-            "CreditCardID": order.CreditCardID,
-            "CreditCardApprovalCode": order.CreditCardApprovalCode,
-            "CurrencyRateID": order.CurrencyRateID,
-            "SubTotal": order.SubTotal,
-            "TaxAmt": order.TaxAmt,
-            "Freight": order.Freight,
-            "TotalDue": order.TotalDue,
-        }
+        order_data = order_header_to_dict(order)
 
         return jsonify(order_data), 201
 
@@ -390,65 +718,43 @@ def get_sales_order(order_id):
         (line items). Returns 404 if order not found.
     """
     with get_db_session() as session:
-
-        order = (
-            session.query(SalesOrderHeader)
-            .options(joinedload(SalesOrderHeader.order_details))
-            .filter(SalesOrderHeader.SalesOrderID == order_id)
+        # Read plain rows instead of ORM instances: one query for the header
+        # and one for its details joined to their products
+        header = (
+            session.execute(
+                select(*_HEADER_COLUMNS).where(
+                    SalesOrderHeader.SalesOrderID == order_id
+                )
+            )
+            .mappings()
             .first()
         )
 
-        if not order:
+        if not header:
             abort(404, description=f"Sales order with ID {order_id} not found")
 
+        rows = session.execute(
+            select(*_NESTED_DETAIL_COLUMNS, *_PRODUCT_COLUMNS)
+            .outerjoin(Product, SalesOrderDetail.ProductID == Product.ProductID)
+            .where(SalesOrderDetail.SalesOrderID == order_id)
+            .order_by(SalesOrderDetail.SalesOrderDetailID)
+        ).all()
+
         # Build header data
-        order_data = {
-            "SalesOrderID": order.SalesOrderID,
-            "RevisionNumber": order.RevisionNumber,
-            "OrderDate": order.OrderDate.isoformat() if order.OrderDate else None,
-            "DueDate": order.DueDate.isoformat() if order.DueDate else None,
-            "ShipDate": order.ShipDate.isoformat() if order.ShipDate else None,
-            "Status": order.Status,
-            "OnlineOrderFlag": order.OnlineOrderFlag,
-            "SalesOrderNumber": order.SalesOrderNumber,
-            "PurchaseOrderNumber": order.PurchaseOrderNumber,
-            "AccountNumber": order.AccountNumber,
-            "CustomerID": order.CustomerID,
-            "SalesPersonID": order.SalesPersonID,
-            "TerritoryID": order.TerritoryID,
-            "BillToAddressID": order.BillToAddressID,
-            "ShipToAddressID": order.ShipToAddressID,
-            "ShipMethodID": order.ShipMethodID,
-            "CreditCardID": order.CreditCardID,
-            "CreditCardApprovalCode": order.CreditCardApprovalCode,
-            "CurrencyRateID": order.CurrencyRateID,
-            "SubTotal": order.SubTotal,
-            "TaxAmt": order.TaxAmt,
-            "Freight": order.Freight,
-            "TotalDue": order.TotalDue,
-            "OrderDetails": [],
-        }
+        order_data = dict(header)
 
         # Add order details (line items) with product information
-        for detail in order.order_details:
-            detail_dict = {
-                "SalesOrderDetailID": detail.SalesOrderDetailID,
-                "CarrierTrackingNumber": detail.CarrierTrackingNumber,
-                "OrderQty": detail.OrderQty,
-                "ProductID": detail.ProductID,
-                "SpecialOfferID": detail.SpecialOfferID,
-                "UnitPrice": detail.UnitPrice,
-                "UnitPriceDiscount": detail.UnitPriceDiscount,
-                "LineTotal": detail.LineTotal,
-            }
-
-            # Add product information if available
-            if detail.product:
-                detail_dict["Product"] = product_to_dict(detail.product)
-
+        # Each row holds the detail columns followed by the product columns
+        split = len(_NESTED_DETAIL_FIELDS)
+        order_data["OrderDetails"] = []
+        for row in rows:
+            detail_dict = dict(zip(_NESTED_DETAIL_FIELDS, row[:split]))
+            # The product columns are null when the product does not exist
+            if row[split] is not None:
+                detail_dict["Product"] = dict(zip(_PRODUCT_FIELDS, row[split:]))
             order_data["OrderDetails"].append(detail_dict)
 
-        return jsonify(order_data), 200
+        return conditional_json(order_data)
 
 
 @app.route("/sales_orders/<int:order_id>", methods=["PUT"])
@@ -467,100 +773,25 @@ def update_sales_order(order_id):
         JSON object containing the updated sales order header.
         Returns 404 if order not found, 400 for invalid requests.
     """
-    if not request.is_json:
-        abort(400, description="Request body must be JSON")
-
-    data = request.get_json()
+    data = parse_request_body(SalesOrderUpdate)
 
     # SalesOrderID cannot be updated
     if "SalesOrderID" in data and data["SalesOrderID"] != order_id:
         abort(400, description="SalesOrderID cannot be modified")
 
     with get_db_session() as session:
-        order = (
-            session.query(SalesOrderHeader)
-            .filter(SalesOrderHeader.SalesOrderID == order_id)
-            .first()
-        )
+        order = session.get(SalesOrderHeader, order_id)
 
         if not order:
             abort(404, description=f"Sales order with ID {order_id} not found")
 
-        # List of editable fields (excluding primary key)
-        editable_fields = [
-            "RevisionNumber",
-            "OrderDate",
-            "DueDate",
-            "ShipDate",
-            "Status",
-            "OnlineOrderFlag",
-            "SalesOrderNumber",
-            "PurchaseOrderNumber",
-            "AccountNumber",
-            "CustomerID",
-            "SalesPersonID",
-            "TerritoryID",
-            "BillToAddressID",
-            "ShipToAddressID",
-            "ShipMethodID",
-            "CreditCardID",
-            "CreditCardApprovalCode",
-            "CurrencyRateID",
-            "SubTotal",
-            "TaxAmt",
-            "Freight",
-            "TotalDue",
-        ]
-
         # Update only provided fields
-        for field in editable_fields:
-            if field in data:
-                value = data[field]
-
-                # Handle datetime fields
-                if field in ["OrderDate", "DueDate", "ShipDate"]:
-                    if value is not None:
-                        try:
-                            # Try parsing ISO format datetime string
-                            if isinstance(value, str):
-                                value = datetime.fromisoformat(
-                                    value.replace("Z", "+00:00")
-                                )
-                        except (ValueError, AttributeError):
-                            abort(
-                                400,
-                                description=f"Invalid date format for {field}. "
-                                "Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-                            )
-
-                setattr(order, field, value)
+        data.pop("SalesOrderID", None)
+        for field, value in data.items():
+            setattr(order, field, value)
 
         # Build response with updated order data
-        order_data = {
-            "SalesOrderID": order.SalesOrderID,
-            "RevisionNumber": order.RevisionNumber,
-            "OrderDate": order.OrderDate.isoformat() if order.OrderDate else None,
-            "DueDate": order.DueDate.isoformat() if order.DueDate else None,
-            "ShipDate": order.ShipDate.isoformat() if order.ShipDate else None,
-            "Status": order.Status,
-            "OnlineOrderFlag": order.OnlineOrderFlag,
-            "SalesOrderNumber": order.SalesOrderNumber,
-            "PurchaseOrderNumber": order.PurchaseOrderNumber,
-            "AccountNumber": order.AccountNumber,
-            "CustomerID": order.CustomerID,
-            "SalesPersonID": order.SalesPersonID,
-            "TerritoryID": order.TerritoryID,
-            "BillToAddressID": order.BillToAddressID,
-            "ShipToAddressID": order.ShipToAddressID,
-            "ShipMethodID": order.ShipMethodID,
-            "CreditCardID": order.CreditCardID,
-            "CreditCardApprovalCode": order.CreditCardApprovalCode,
-            "CurrencyRateID": order.CurrencyRateID,
-            "SubTotal": order.SubTotal,
-            "TaxAmt": order.TaxAmt,
-            "Freight": order.Freight,
-            "TotalDue": order.TotalDue,
-        }
+        order_data = order_header_to_dict(order)
 
         return jsonify(order_data), 200
 
@@ -578,22 +809,23 @@ def delete_sales_order(order_id):
         Returns 404 if not found.
     """
     with get_db_session() as session:
-        order = (
-            session.query(SalesOrderHeader)
-            .filter(SalesOrderHeader.SalesOrderID == order_id)
-            .first()
+        # Delete associated order details first. The foreign key cascades on
+        # databases that enforce it, but SQLite only does so with foreign_keys on.
+        session.execute(
+            delete(SalesOrderDetail)
+            .where(SalesOrderDetail.SalesOrderID == order_id)
+            .execution_options(synchronize_session=False)
         )
 
-        if not order:
-            abort(404, description=f"Sales order with ID {order_id} not found")
-
-        # Delete associated order details first
-        session.query(SalesOrderDetail).filter(
-            SalesOrderDetail.SalesOrderID == order_id
-        ).delete()
+        # Delete the order without loading it first
+        result = session.execute(
+            delete(SalesOrderHeader)
+            .where(SalesOrderHeader.SalesOrderID == order_id)
+            .execution_options(synchronize_session=False)
+        )
 
-        # Delete the order
-        session.delete(order)
+        if result.rowcount == 0:
+            abort(404, description=f"Sales order with ID {order_id} not found")
         # Response will be committed by the context manager
 
         return "", 204
@@ -602,35 +834,68 @@ def delete_sales_order(order_id):
 @app.route("/sales_order_details", methods=["GET"])
 def get_sales_order_details():
     """
-    Lists all sales order details across all orders.
+    Lists sales order details across all orders with keyset pagination.
+    The response is streamed as rows are read from the database.
+
+    Query Parameters:
+        per_page (int): Number of items per page (default: 10, minimum: 1, maximum: 100)
+        after_id (int): Return details with a SalesOrderDetailID greater than this
+            value. Pass next_after_id from the previous page to fetch the next one.
 
     Returns:
-        JSON array of all sales order details with product information.
+        JSON object containing:
+            - data: Array of sales order details with product information
+            - pagination: Object with pagination metadata (per_page, has_next, next_after_id)
     """
-    with get_db_session() as session:
-        details = session.query(SalesOrderDetail).all()
-
-        details_data = []
-        for detail in details:
-            detail_dict = {
-                "SalesOrderID": detail.SalesOrderID,
-                "SalesOrderDetailID": detail.SalesOrderDetailID,
-                "CarrierTrackingNumber": detail.CarrierTrackingNumber,
-                "OrderQty": detail.OrderQty,
-                "ProductID": detail.ProductID,
-                "SpecialOfferID": detail.SpecialOfferID,
-                "UnitPrice": detail.UnitPrice,
-                "UnitPriceDiscount": detail.UnitPriceDiscount,
-                "LineTotal": detail.LineTotal,
-            }
+    # Get pagination parameters from query string
+    try:
+        per_page = int(request.args.get("per_page", 10))
+        after_id = request.args.get("after_id")
+        after_id = int(after_id) if after_id is not None else None
+    except (ValueError, TypeError):
+        abort(400, description="per_page and after_id must be valid integers")
 
-            # Add product information if available
-            if detail.product:
-                detail_dict["Product"] = product_to_dict(detail.product)
+    # Validate pagination parameters
+    if per_page < 1:
+        abort(400, description="per_page must be greater than or equal to 1")
+    if per_page > 100:
+        abort(400, description="per_page cannot exceed 100")
 
-            details_data.append(detail_dict)
+    # Fetch one extra row to know whether there is a next page
+    stmt = (
+        select(SalesOrderDetail)
+        .options(joinedload(SalesOrderDetail.product))
+        .order_by(SalesOrderDetail.SalesOrderDetailID)
+        .limit(per_page + 1)
+        .execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+    )
+    if after_id is not None:
+        stmt = stmt.where(SalesOrderDetail.SalesOrderDetailID > after_id)
+
+    def generate():
+        with get_db_session() as session:
+            has_next = False
+            last_id = None
+
+            yield '{"data": ['
+            for index, detail in enumerate(session.execute(stmt).scalars()):
+                if index == per_page:
+                    has_next = True
+                    break
+
+                detail_dict = order_detail_to_dict(detail)
+                yield ("," if index else "") + app.json.dumps(detail_dict)
+                last_id = detail.SalesOrderDetailID
+
+            # Build pagination metadata
+            pagination = {
+                "per_page": per_page,
+                "has_next": has_next,
+                "next_after_id": last_id if has_next else None,
+            }
+            yield '], "pagination": ' + app.json.dumps(pagination) + "}"
 
-        return jsonify(details_data), 200
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 
 @app.route("/sales_order_details", methods=["POST"])
@@ -646,74 +911,26 @@ def create_sales_order_detail():
         JSON object containing the created sales order detail with product information
         and 201 status code. Returns 400 for invalid requests, 404 if order not found.
     """
-    if not request.is_json:
-        abort(400, description="Request body must be JSON")
-
-    data = request.get_json()
-
-    # Validate required fields
-    if "SalesOrderID" not in data:
-        abort(400, description="SalesOrderID is required")
-    if "ProductID" not in data:
-        abort(400, description="ProductID is required")
+    data = parse_request_body(SalesOrderDetailCreate)
 
     with get_db_session() as session:
         # Verify the sales order exists
-        order = (
-            session.query(SalesOrderHeader)
-            .filter(SalesOrderHeader.SalesOrderID == data["SalesOrderID"])
-            .first()
-        )
+        order = session.get(SalesOrderHeader, data["SalesOrderID"])
         if not order:
             abort(
                 404,
                 description=f"Sales order with ID {data['SalesOrderID']} not found",
             )
 
-        # Create new order detail
-        detail = SalesOrderDetail()
-
-        # Set required fields
-        detail.SalesOrderID = data["SalesOrderID"]
-        detail.ProductID = data["ProductID"]
-
-        # Set SalesOrderDetailID only if explicitly provided (otherwise SQLite auto-assigns)
-        if "SalesOrderDetailID" in data:
-            detail.SalesOrderDetailID = data["SalesOrderDetailID"]
-
-        # Handle optional fields
-        optional_fields = [
-            "CarrierTrackingNumber",
-            "OrderQty",
-            "SpecialOfferID",
-            "UnitPrice",
-            "UnitPriceDiscount",
-            "LineTotal",
-        ]
-
-        for field in optional_fields:
-            if field in data:
-                setattr(detail, field, data[field])
+        # Create new order detail. SalesOrderDetailID is only set if explicitly
+        # provided (otherwise SQLite auto-assigns)
+        detail = SalesOrderDetail(**data)
 
         session.add(detail)
         session.flush()  # Flush to get the auto-generated ID
 
         # Build response
-        detail_data = {
-            "SalesOrderID": detail.SalesOrderID,
-            "SalesOrderDetailID": detail.SalesOrderDetailID,
-            "CarrierTrackingNumber": detail.CarrierTrackingNumber,
-            "OrderQty": detail.OrderQty,
-            "ProductID": detail.ProductID,
-            "SpecialOfferID": detail.SpecialOfferID,
-            "UnitPrice": detail.UnitPrice,
-            "UnitPriceDiscount": detail.UnitPriceDiscount,
-            "LineTotal": detail.LineTotal,
-        }
-
-        # Add product information if available
-        if detail.product:
-            detail_data["Product"] = product_to_dict(detail.product)
+        detail_data = order_detail_to_dict(detail)
 
         return jsonify(detail_data), 201
 
@@ -731,33 +948,20 @@ def get_sales_order_detail(detail_id):
         Returns 404 if not found.
     """
     with get_db_session() as session:
-        detail = (
-            session.query(SalesOrderDetail)
-            .filter(SalesOrderDetail.SalesOrderDetailID == detail_id)
-            .first()
+        # Load the product in the same query, since the response includes it
+        detail = session.get(
+            SalesOrderDetail,
+            detail_id,
+            options=[joinedload(SalesOrderDetail.product)],
         )
 
         if not detail:
             abort(404, description=f"Sales order detail with ID {detail_id} not found")
 
         # Build response
-        detail_data = {
-            "SalesOrderID": detail.SalesOrderID,
-            "SalesOrderDetailID": detail.SalesOrderDetailID,
-            "CarrierTrackingNumber": detail.CarrierTrackingNumber,
-            "OrderQty": detail.OrderQty,
-            "ProductID": detail.ProductID,
-            "SpecialOfferID": detail.SpecialOfferID,
-            "UnitPrice": detail.UnitPrice,
-            "UnitPriceDiscount": detail.UnitPriceDiscount,
-            "LineTotal": detail.LineTotal,
-        }
-
-        # Add product information if available
-        if detail.product:
-            detail_data["Product"] = product_to_dict(detail.product)
+        detail_data = order_detail_to_dict(detail)
 
-        return jsonify(detail_data), 200
+        return conditional_json(detail_data)
 
 
 @app.route("/sales_order_details/<int:detail_id>", methods=["PUT"])
@@ -775,57 +979,30 @@ def update_sales_order_detail(detail_id):
         JSON object containing the updated sales order detail with product
         information. Returns 404 if not found, 400 for invalid requests.
     """
-    if not request.is_json:
-        abort(400, description="Request body must be JSON")
-
-    data = request.get_json()
+    data = parse_request_body(SalesOrderDetailUpdate)
 
     # SalesOrderDetailID cannot be updated
     if "SalesOrderDetailID" in data and data["SalesOrderDetailID"] != detail_id:
         abort(400, description="SalesOrderDetailID cannot be modified")
 
     with get_db_session() as session:
-        detail = (
-            session.query(SalesOrderDetail)
-            .filter(SalesOrderDetail.SalesOrderDetailID == detail_id)
-            .first()
+        # Load the product in the same query, since the response includes it
+        detail = session.get(
+            SalesOrderDetail,
+            detail_id,
+            options=[joinedload(SalesOrderDetail.product)],
         )
 
         if not detail:
             abort(404, description=f"Sales order detail with ID {detail_id} not found")
 
-        # Editable fields for order details
-        editable_fields = [
-            "CarrierTrackingNumber",
-            "OrderQty",
-            "ProductID",
-            "SpecialOfferID",
-            "UnitPrice",
-            "UnitPriceDiscount",
-            "LineTotal",
-        ]
-
         # Update only provided fields
-        for field in editable_fields:
-            if field in data:
-                setattr(detail, field, data[field])
+        data.pop("SalesOrderDetailID", None)
+        for field, value in data.items():
+            setattr(detail, field, value)
 
         # Build response
-        detail_data = {
-            "SalesOrderID": detail.SalesOrderID,
-            "SalesOrderDetailID": detail.SalesOrderDetailID,
-            "CarrierTrackingNumber": detail.CarrierTrackingNumber,
-            "OrderQty": detail.OrderQty,
-            "ProductID": detail.ProductID,
-            "SpecialOfferID": detail.SpecialOfferID,
-            "UnitPrice": detail.UnitPrice,
-            "UnitPriceDiscount": detail.UnitPriceDiscount,
-            "LineTotal": detail.LineTotal,
-        }
-
-        # Add product information if available
-        if detail.product:
-            detail_data["Product"] = product_to_dict(detail.product)
+        detail_data = order_detail_to_dict(detail)
 
         return jsonify(detail_data), 200
 
@@ -843,11 +1020,7 @@ def delete_sales_order_detail(detail_id):
         Returns 404 if not found.
     """
     with get_db_session() as session:
-        detail = (
-            session.query(SalesOrderDetail)
-            .filter(SalesOrderDetail.SalesOrderDetailID == detail_id)
-            .first()
-        )
+        detail = session.get(SalesOrderDetail, detail_id)
 
         if not detail:
             abort(404, description=f"Sales order detail with ID {detail_id} not found")
@@ -883,11 +1056,7 @@ def search_customers():
         # Try to match by CustomerID if query is numeric
         if query.isdigit():
             customer_id = int(query)
-            customer = (
-                session.query(Customer)
-                .filter(Customer.CustomerID == customer_id)
-                .first()
-            )
+            customer = session.get(Customer, customer_id)
             if customer:
                 # Get customer detail
                 customer_detail = None
@@ -1070,49 +1239,38 @@ def search_products():
     if not query:
         return jsonify([]), 200
 
-    results = []
+    # Matches keyed by ProductID, in priority order (ID, name, product number)
+    results = {}
 
     with get_db_session() as session:
         # Try to match by ProductID if query is numeric
         if query.isdigit():
-            product_id = int(query)
             product = (
-                session.query(Product).filter(Product.ProductID == product_id).first()
+                session.execute(
+                    select(*_PRODUCT_COLUMNS).where(Product.ProductID == int(query))
+                )
+                .mappings()
+                .first()
             )
             if product:
-                results.append(product_to_dict(product))
-
-        # Search by product name
-        if len(results) < limit:
-            search_term = f"%{query}%"
-            products_by_name = (
-                session.query(Product)
-                .filter(Product.Name.ilike(search_term))
-                .limit(limit)
-                .all()
-            )
+                results[product["ProductID"]] = product
 
-            for product in products_by_name:
-                # Avoid duplicates if already found by ID
-                if not any(r["ProductID"] == product.ProductID for r in results):
-                    results.append(product_to_dict(product))
-
-        # Search by product number
-        if len(results) < limit:
-            products_by_number = (
-                session.query(Product)
-                .filter(Product.ProductNumber.ilike(f"%{query}%"))
-                .limit(limit)
-                .all()
-            )
+        # Search by product name, then by product number
+        search_term = f"%{query}%"
+        for column in (Product.Name, Product.ProductNumber):
+            if len(results) >= limit:
+                break
+
+            products = session.execute(
+                select(*_PRODUCT_COLUMNS).where(column.ilike(search_term)).limit(limit)
+            ).mappings()
 
-            for product in products_by_number:
-                # Avoid duplicates
-                if not any(r["ProductID"] == product.ProductID for r in results):
-                    results.append(product_to_dict(product))
+            for product in products:
+                # Avoid duplicates if already found
+                results.setdefault(product["ProductID"], product)
 
     # Limit results
-    results = results[:limit]
+    results = list(results.values())[:limit]
 
     return jsonify(results), 200
 
@@ -1,12 +1,22 @@
 import base64
-import json
+import hashlib
 import os
+import re
 from io import BytesIO
 
 import anthropic
+import orjson
+import pydantic
+from customer_matching import match_customer_to_database
 from db import get_db_session
+from document_processor import extract_text_from_document
 from dotenv import load_dotenv
-from models import Customer, IndividualCustomer, StoreCustomer
+from extraction_cache import (
+    extraction_cache_key,
+    get_cached_extraction,
+    set_cached_extraction,
+)
+from schemas import ExtractedInvoice
 
 # Load environment variables
 load_dotenv()
@@ -19,20 +29,19 @@ if not ANTHROPIC_API_KEY:
         "Set it in .env file or environment."
     )
 
-client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+# Transient API errors are retried by the client with exponential backoff
+client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=3, timeout=120.0)
 
+# Model used for extraction
+EXTRACTION_MODEL = "claude-3-5-sonnet-20241022"
 
-def create_extraction_prompt(text_content):
-    """
-    Create a prompt for Claude to extract invoice data.
+# Outermost JSON object or array in a response wrapped in markdown fences or prose
+_JSON_RE = re.compile(r"(\{.*\}|\[.*\])", re.S)
 
-    Args:
-        text_content: Extracted text from the document
 
-    Returns:
-        str: Formatted prompt for Claude
-    """
-    prompt = """You are an expert at extracting structured data from invoices and sales documents.
+# Static instructions sent ahead of the document text
+# Sent as a separate cached block so repeat requests reuse the prompt prefix
+EXTRACTION_PROMPT = """You are an expert at extracting structured data from invoices and sales documents.
 
 Extract all relevant information from the following document text and return it as a JSON object matching the structure below.
 
@@ -79,7 +88,27 @@ Return ONLY valid JSON, no additional text or markdown formatting.
 
 Document text:
 """
-    return prompt + text_content
+
+# Hash of the prompt, model and response schema, part of the cache key, so results
+# cached before any of them changed are not reused
+EXTRACTION_FINGERPRINT = hashlib.sha256(
+    orjson.dumps(
+        [EXTRACTION_PROMPT, EXTRACTION_MODEL, ExtractedInvoice.model_json_schema()]
+    )
+).hexdigest()[:16]
+
+
+def create_extraction_prompt(text_content):
+    """
+    Create a prompt for Claude to extract invoice data.
+
+    Args:
+        text_content: Extracted text from the document
+
+    Returns:
+        str: Formatted prompt for Claude
+    """
+    return EXTRACTION_PROMPT + text_content
 
 
 def call_anthropic_api(text_content):
@@ -90,21 +119,28 @@ def call_anthropic_api(text_content):
         text_content: Extracted text from document
 
     Returns:
-        dict: Parsed JSON response from LLM
+        ExtractedInvoice: Parsed and validated response from LLM
 
     Raises:
         ValueError: If API call fails or response is invalid
     """
     try:
-        prompt = create_extraction_prompt(text_content)
-
+        # The static instructions are marked for prompt caching; only the
+        # document text changes between requests
         message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
+            model=EXTRACTION_MODEL,
             max_tokens=4096,
             messages=[
                 {
                     "role": "user",
-                    "content": prompt,
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": EXTRACTION_PROMPT,
+                            "cache_control": {"type": "ephemeral"},
+                        },
+                        {"type": "text", "text": text_content},
+                    ],
                 }
             ],
         )
@@ -112,22 +148,18 @@ def call_anthropic_api(text_content):
         # Extract text from response
         response_text = message.content[0].text
 
-        # Try to extract JSON from response (may be wrapped in markdown)
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        # Parse JSON
+        # Parse and validate JSON in one pass, falling back to the JSON
+        # embedded in markdown or prose
         try:
-            extracted_data = json.loads(response_text)
-            return extracted_data
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse LLM response as JSON: {str(e)}")
+            return ExtractedInvoice.model_validate_json(response_text)
+        except pydantic.ValidationError as e:
+            match = _JSON_RE.search(response_text)
+            if not match:
+                raise ValueError(f"Failed to parse LLM response as JSON: {str(e)}")
+            try:
+                return ExtractedInvoice.model_validate_json(match.group(1))
+            except pydantic.ValidationError as e:
+                raise ValueError(f"Failed to parse LLM response as JSON: {str(e)}")
 
     except anthropic.APIError as e:
         raise ValueError(f"Anthropic API error: {str(e)}")
@@ -135,68 +167,6 @@ def call_anthropic_api(text_content):
         raise ValueError(f"Error calling Anthropic API: {str(e)}")
 
 
-def match_customer_to_database(customer_name, session):
-    """
-    Match extracted customer name to CustomerID in database.
-
-    Args:
-        customer_name: Customer name extracted from document
-        session: Database session
-
-    Returns:
-        tuple: (CustomerID, TerritoryID) or (None, None) if not found
-    """
-    if not customer_name:
-        return None, None
-
-    customer_name = customer_name.strip()
-
-    # Try to match individual customer (FirstName + LastName)
-    # Split name into parts
-    name_parts = customer_name.split()
-    if len(name_parts) >= 2:
-        first_name = name_parts[0]
-        last_name = " ".join(name_parts[1:])
-
-        individual = (
-            session.query(IndividualCustomer)
-            .filter(
-                IndividualCustomer.FirstName.ilike(f"%{first_name}%"),
-                IndividualCustomer.LastName.ilike(f"%{last_name}%"),
-            )
-            .first()
-        )
-
-        if individual:
-            # Find corresponding Customer record
-            customer = (
-                session.query(Customer)
-                .filter(Customer.PersonID == individual.BusinessEntityID)
-                .first()
-            )
-            if customer:
-                return customer.CustomerID, customer.TerritoryID
-
-    # Try to match store customer (Name)
-    store = (
-        session.query(StoreCustomer)
-        .filter(StoreCustomer.Name.ilike(f"%{customer_name}%"))
-        .first()
-    )
-
-    if store:
-        # Find corresponding Customer record
-        customer = (
-            session.query(Customer)
-            .filter(Customer.StoreID == store.BusinessEntityID)
-            .first()
-        )
-        if customer:
-            return customer.CustomerID, customer.TerritoryID
-
-    return None, None
-
-
 def process_invoice_document(file, filename):
     """
     Process an uploaded invoice document and extract structured data.
@@ -211,28 +181,40 @@ def process_invoice_document(file, filename):
     Raises:
         ValueError: If processing fails
     """
-    # Extract text from document
-    text_content = extract_text_from_document(file, filename)
-
-    if not text_content or not text_content.strip():
-        raise ValueError("No text could be extracted from the document")
-
-    # Call LLM API to extract structured data
-    extracted_data = call_anthropic_api(text_content)
+    # Read the document once; the hash identifies repeat uploads of the same file
+    file.seek(0)
+    data = file.read()
+    cache_key = extraction_cache_key(f"claude-{EXTRACTION_FINGERPRINT}", data)
+
+    # Results are cached as validated JSON, independent of the model's pickle layout
+    cached_json = get_cached_extraction(cache_key)
+    if cached_json is not None:
+        extracted = ExtractedInvoice.model_validate_json(cached_json)
+    else:
+        # Extract text from document
+        text_content = extract_text_from_document(BytesIO(data), filename)
+
+        if not text_content or not text_content.strip():
+            raise ValueError("No text could be extracted from the document")
+
+        # Call LLM API to extract structured data
+        extracted = call_anthropic_api(text_content)
+        set_cached_extraction(cache_key, extracted.model_dump_json(exclude_unset=True))
 
     # Match customer if customer name was extracted
-    if "extracted_customer_name" in extracted_data:
-        customer_name = extracted_data.get("extracted_customer_name")
-        if customer_name:
-            with get_db_session() as session:
-                customer_id, territory_id = match_customer_to_database(
-                    customer_name, session
-                )
-                # Update header with matched IDs
-                if "header" in extracted_data:
-                    if customer_id:
-                        extracted_data["header"]["CustomerID"] = customer_id
-                    if territory_id:
-                        extracted_data["header"]["TerritoryID"] = territory_id
-
-    return extracted_data
+    customer_name = extracted.extracted_customer_name
+    if customer_name:
+        with get_db_session() as session:
+            customer_id, territory_id = match_customer_to_database(
+                customer_name, session
+            )
+            # Update header with matched IDs
+            if "header" in extracted.model_fields_set:
+                if customer_id:
+                    extracted.header.CustomerID = customer_id
+                if territory_id:
+                    extracted.header.TerritoryID = territory_id
+
+    # Convert to a plain dict only at the boundary; only fields the LLM
+    # returned (or that were matched) are included
+    return extracted.model_dump(mode="json", exclude_unset=True)
@@ -0,0 +1,176 @@
+"""
+Matching of extracted customer names to customers in the database, shared by the
+extraction pipelines. Matches, including misses, are cached in memory so repeat
+customers in a batch of invoices don't rescan the customer tables.
+"""
+
+import re
+from threading import Lock
+from typing import NamedTuple
+
+from cachetools import TTLCache
+from models import Customer, IndividualCustomer, StoreCustomer
+from sqlalchemy import func, literal, select, union_all
+
+# Cache of normalized customer name -> CustomerMatch, or None for names without a match
+CUSTOMER_MATCH_CACHE_SIZE = 10_000
+CUSTOMER_MATCH_CACHE_TTL = 3600  # seconds
+_customer_match_cache = TTLCache(
+    maxsize=CUSTOMER_MATCH_CACHE_SIZE, ttl=CUSTOMER_MATCH_CACHE_TTL
+)
+_customer_match_lock = Lock()
+
+# Marks a name missing from the cache, as opposed to a cached miss stored as None
+_NOT_CACHED = object()
+
+# Legal form suffix marking a customer name as a company (store) name
+_COMPANY_SUFFIX_RE = re.compile(
+    r"\b(?:inc|llc|ltd|corp|corporation|co|company|gmbh|plc|bv)\b\.?", re.IGNORECASE
+)
+
+
+class CustomerMatch(NamedTuple):
+    """Customer matched to a name, with the id of its individual or store row."""
+
+    CustomerID: int
+    TerritoryID: int | None
+    detail_id: int
+    is_store: bool
+
+
+def match_customer(customer_name: str | None, session) -> CustomerMatch | None:
+    """
+    Find the customer best matching an extracted customer name.
+
+    Args:
+        customer_name: Customer name extracted from document
+        session: Database session
+
+    Returns:
+        CustomerMatch: Matched customer, or None if not found
+    """
+    customer_name = customer_name.strip() if customer_name else ""
+    if not customer_name:
+        return None
+
+    # Names are matched case-insensitively, so cache on the lowercased name
+    cache_key = customer_name.lower()
+    with _customer_match_lock:
+        match = _customer_match_cache.get(cache_key, _NOT_CACHED)
+    if match is _NOT_CACHED:
+        match = _find_customer(customer_name, session)
+        with _customer_match_lock:
+            _customer_match_cache[cache_key] = match
+
+    return match
+
+
+def match_customer_to_database(customer_name: str | None, session) -> tuple:
+    """
+    Match extracted customer name to CustomerID in database.
+
+    Args:
+        customer_name: Customer name extracted from document
+        session: Database session
+
+    Returns:
+        tuple: (CustomerID, TerritoryID) or (None, None) if not found
+    """
+    match = match_customer(customer_name, session)
+    if match is None:
+        return None, None
+    return match.CustomerID, match.TerritoryID
+
+
+def _find_customer(customer_name: str, session) -> CustomerMatch | None:
+    """
+    Look up the customer matching a name in the database.
+
+    Args:
+        customer_name: Stripped customer name
+        session: Database session
+
+    Returns:
+        CustomerMatch: Matched customer, or None if not found
+    """
+    # Individual customers are matched on FirstName + LastName; single words and
+    # names with a company suffix can only be stores
+    name_parts = customer_name.split()
+    first_name = name_parts[0]
+    last_name = " ".join(name_parts[1:])
+    match_individual = len(name_parts) >= 2 and not _COMPANY_SUFFIX_RE.search(
+        customer_name
+    )
+
+    # Exact case-insensitive match first, which can use the lower() indexes;
+    # fall back to a substring scan only if it finds nothing
+    match = (
+        session.execute(
+            _customer_match_query(
+                func.lower(IndividualCustomer.FirstName) == first_name.lower(),
+                func.lower(IndividualCustomer.LastName) == last_name.lower(),
+                func.lower(StoreCustomer.Name) == customer_name.lower(),
+                match_individual=match_individual,
+            )
+        ).first()
+        or session.execute(
+            _customer_match_query(
+                IndividualCustomer.FirstName.ilike(f"%{first_name}%"),
+                IndividualCustomer.LastName.ilike(f"%{last_name}%"),
+                StoreCustomer.Name.ilike(f"%{customer_name}%"),
+                match_individual=match_individual,
+            )
+        ).first()
+    )
+
+    if not match:
+        return None
+    return CustomerMatch(
+        match.CustomerID, match.TerritoryID, match.detail_id, bool(match.is_store)
+    )
+
+
+def _customer_match_query(
+    first_name_filter, last_name_filter, store_name_filter, match_individual
+):
+    """
+    Build a single query returning the best matching customer, joining the
+    Customer table to individual and store customers in one roundtrip.
+    Individual customer matches are preferred over store matches.
+
+    Args:
+        first_name_filter: Condition on IndividualCustomer.FirstName
+        last_name_filter: Condition on IndividualCustomer.LastName
+        store_name_filter: Condition on StoreCustomer.Name
+        match_individual: Whether to search individual customers at all
+
+    Returns:
+        Select: Query returning (CustomerID, TerritoryID, detail_id, is_store) rows,
+            best match first
+    """
+    store_match = (
+        select(
+            Customer.CustomerID,
+            Customer.TerritoryID,
+            StoreCustomer.id.label("detail_id"),
+            literal(1).label("is_store"),
+        )
+        .join(StoreCustomer, Customer.StoreID == StoreCustomer.BusinessEntityID)
+        .where(store_name_filter)
+    )
+    if not match_individual:
+        return store_match.limit(1)
+
+    individual_match = (
+        select(
+            Customer.CustomerID,
+            Customer.TerritoryID,
+            IndividualCustomer.id.label("detail_id"),
+            literal(0).label("is_store"),
+        )
+        .join(
+            IndividualCustomer, Customer.PersonID == IndividualCustomer.BusinessEntityID
+        )
+        .where(first_name_filter, last_name_filter)
+    )
+    return union_all(individual_match, store_match).order_by("is_store").limit(1)
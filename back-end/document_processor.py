@@ -3,6 +3,11 @@ Document processing module for invoice extraction.
 Handles text extraction from PDFs and images, and LLM-based data extraction.
 """
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
 from PIL import Image
 from pypdf import PdfReader
 from pytesseract import image_to_string
@@ -10,6 +15,11 @@ from pytesseract import image_to_string
 # Maximum file size (10MB)
 MAX_FILE_SIZE = 10 * 1024 * 1024
 
+# Minimum number of pages per process when a PDF's text is extracted in a process
+# pool; pool workers start a fresh interpreter, so fewer pages per worker cost more
+# in start-up than the parallel extraction saves
+PARALLEL_PDF_MIN_PAGES = 16
+
 # Allowed file types
 ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg"}
 ALLOWED_MIME_TYPES = {
@@ -20,25 +30,72 @@ ALLOWED_MIME_TYPES = {
 }
 
 
+def _extract_page_range(pdf_bytes: bytes, start: int, stop: int) -> list[str]:
+    """
+    Extract text from a contiguous range of PDF pages in a worker process.
+
+    Args:
+        pdf_bytes: Raw PDF data
+        start: Index of the first page
+        stop: Index one past the last page
+
+    Returns:
+        list[str]: Text of each page in the range
+    """
+    pdf_reader = PdfReader(BytesIO(pdf_bytes))
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
 def extract_text_from_pdf(file):
     """
     Extract text from a PDF file.
+    Large PDFs are split into page ranges extracted in parallel processes.
 
     Args:
         file: File-like object containing PDF data
 
     Returns:
         str: Extracted text content
+
+    Raises:
+        ValueError: If the PDF has no text layer (e.g. a scanned document)
     """
     try:
-        pdf_reader = PdfReader(file)
-        text_parts = []
-        for page in pdf_reader.pages:
-            text_parts.append(page.extract_text())
-        return "\n".join(text_parts)
+        file.seek(0)
+        pdf_bytes = file.read()
+        pdf_reader = PdfReader(BytesIO(pdf_bytes))
+        page_count = len(pdf_reader.pages)
+        workers = min(os.cpu_count() or 1, page_count // PARALLEL_PDF_MIN_PAGES)
+
+        # Daemonic processes (e.g. Celery prefork workers) cannot start children
+        if workers > 1 and not multiprocessing.current_process().daemon:
+            # One contiguous page range per worker; each re-parses the PDF once
+            bounds = [page_count * i // workers for i in range(workers + 1)]
+            # Spawned rather than forked: gunicorn gthread workers run other threads,
+            # and a forked child can inherit a lock one of them holds and deadlock
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                ranges = executor.map(
+                    _extract_page_range,
+                    [pdf_bytes] * workers,
+                    bounds[:-1],
+                    bounds[1:],
+                )
+                text_parts = [text for page_texts in ranges for text in page_texts]
+        else:
+            text_parts = [page.extract_text() or "" for page in pdf_reader.pages]
+        text = "\n".join(text_parts)
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
+    # Scanned PDFs have no text layer; fail loudly instead of returning ""
+    if not text.strip():
+        raise ValueError(
+            "PDF contains no extractable text; it appears to be image-based"
+        )
+    return text
+
 
 def extract_text_from_image(file):
     """
@@ -8,64 +8,141 @@ from models import (
     Customer,
     IndividualCustomer,
     Product,
-    ProductCategory,
     ProductSubCategory,
     SalesOrderDetail,
     SalesOrderHeader,
     SalesTerritory,
     StoreCustomer,
 )
+from sqlalchemy import bindparam, func, or_, select
+from sqlalchemy.orm import contains_eager, selectinload
+
+# Statements are built once at import and reused on every call, so only the
+# first execution pays for constructing and compiling them; later calls hit
+# SQLAlchemy's compiled SQL cache directly
+
+# Rows fetched and turned into ORM objects per batch when iterating results;
+# objects from earlier batches can be garbage collected as iteration goes on
+YIELD_PER = 200
+
+# Products with their subcategory and category
+# The relationships are populated from the joined rows, so accessing them
+# does not issue a query per product
+PRODUCTS_STMT = (
+    select(Product)
+    .join(Product.subcategory)
+    .join(ProductSubCategory.category)
+    .options(
+        contains_eager(Product.subcategory).contains_eager(ProductSubCategory.category)
+    )
+    .limit(10)
+    .execution_options(yield_per=YIELD_PER)
+)
+
+# Orders with customer info
+# Line items and their products are loaded with one SELECT ... IN query each
+# instead of lazily per order and per line item
+ORDERS_STMT = (
+    select(SalesOrderHeader)
+    .join(Customer)
+    .options(
+        selectinload(SalesOrderHeader.order_details).selectinload(
+            SalesOrderDetail.product
+        )
+    )
+    .limit(5)
+    .execution_options(yield_per=YIELD_PER)
+)
+
+# Any product subcategory
+FIRST_SUBCATEGORY_STMT = select(ProductSubCategory).limit(1)
+
+# Product by name; the name is bound at execution
+PRODUCT_BY_NAME_STMT = select(Product).where(Product.Name == bindparam("name")).limit(1)
+
+# Customers with their individual or store details in a single pass over
+# Customers: PersonID = BusinessEntityID for individuals, StoreID =
+# BusinessEntityID for stores
+CUSTOMER_DETAILS_STMT = (
+    select(Customer, IndividualCustomer, StoreCustomer)
+    .outerjoin(
+        IndividualCustomer,
+        Customer.PersonID == IndividualCustomer.BusinessEntityID,
+    )
+    .outerjoin(
+        StoreCustomer,
+        Customer.StoreID == StoreCustomer.BusinessEntityID,
+    )
+    .where(or_(IndividualCustomer.id.is_not(None), StoreCustomer.id.is_not(None)))
+    .limit(10)
+)
+
+# Total sales by territory
+# Aggregated in the database; only one plain row per territory comes back
+SALES_BY_TERRITORY_STMT = (
+    select(
+        SalesTerritory.Name,
+        func.sum(SalesOrderHeader.TotalDue).label("total_sales"),
+        func.count(SalesOrderHeader.SalesOrderID).label("order_count"),
+    )
+    .join(
+        SalesOrderHeader,
+        SalesOrderHeader.TerritoryID == SalesTerritory.TerritoryID,
+    )
+    .group_by(SalesTerritory.TerritoryID, SalesTerritory.Name)
+)
 
 
 def example_query_products():
     """Example: Query products with their categories."""
     with get_db_session() as session:
         # Get all products with their subcategory and category
-        products = (
-            session.query(Product)
-            .join(ProductSubCategory)
-            .join(ProductCategory)
-            .limit(10)
-            .all()
-        )
+        products = session.execute(PRODUCTS_STMT).scalars()
 
+        # Output is collected and written once instead of one print() per line
+        lines = []
         for product in products:
-            print(f"Product: {product.Name}")
-            print(
+            lines.append(f"Product: {product.Name}")
+            lines.append(
                 f"  Subcategory: {product.subcategory.Name if product.subcategory else 'N/A'}"
             )
-            print(
+            lines.append(
                 f"  Category: {product.subcategory.category.Name if product.subcategory else 'N/A'}"
             )
-            print(f"  Price: ${product.ListPrice}")
-            print()
+            lines.append(f"  Price: ${product.ListPrice}")
+            lines.append("")
+        if lines:
+            print("\n".join(lines))
 
 
 def example_query_orders():
     """Example: Query sales orders with customer and line items."""
     with get_db_session() as session:
         # Get orders with customer info
-        orders = session.query(SalesOrderHeader).join(Customer).limit(5).all()
+        orders = session.execute(ORDERS_STMT).scalars()
 
+        lines = []
         for order in orders:
-            print(f"Order #{order.SalesOrderNumber}")
-            print(f"  Date: {order.OrderDate}")
-            print(f"  Customer ID: {order.CustomerID}")
-            print(f"  Total: ${order.TotalDue}")
-            print(f"  Line Items: {len(order.order_details)}")
+            lines.append(f"Order #{order.SalesOrderNumber}")
+            lines.append(f"  Date: {order.OrderDate}")
+            lines.append(f"  Customer ID: {order.CustomerID}")
+            lines.append(f"  Total: ${order.TotalDue}")
+            lines.append(f"  Line Items: {len(order.order_details)}")
             for detail in order.order_details:
-                print(
+                lines.append(
                     f"    - {detail.product.Name if detail.product else 'Unknown'}: "
                     f"{detail.OrderQty} x ${detail.UnitPrice}"
                 )
-            print()
+            lines.append("")
+        if lines:
+            print("\n".join(lines))
 
 
 def example_create_product():
     """Example: Create a new product."""
     with get_db_session() as session:
         # Find a subcategory first
-        subcategory = session.query(ProductSubCategory).first()
+        subcategory = session.execute(FIRST_SUBCATEGORY_STMT).scalar_one_or_none()
 
         if subcategory:
             new_product = Product(
@@ -87,7 +164,8 @@ def example_create_product():
 def example_update_product():
     """Example: Update a product."""
     with get_db_session() as session:
-        product = session.query(Product).filter(Product.ProductID == 1).first()
+        # Primary key lookup; served from the identity map when already loaded
+        product = session.get(Product, 1)
 
         if product and product.ListPrice:
             old_price = product.ListPrice
@@ -103,9 +181,9 @@ def example_delete_product():
     """Example: Delete a product (be careful!)."""
     with get_db_session() as session:
         # Find a product to delete (using a filter to be safe)
-        product = (
-            session.query(Product).filter(Product.Name == "Example Product").first()
-        )
+        product = session.execute(
+            PRODUCT_BY_NAME_STMT, {"name": "Example Product"}
+        ).scalar_one_or_none()
 
         if product:
             session.delete(product)
@@ -117,63 +195,38 @@ def example_delete_product():
 def example_query_customer_details():
     """Example: Query customers with their individual/store details."""
     with get_db_session() as session:
-        # Query individual customers by joining on PersonID = BusinessEntityID
-        customers_with_details = (
-            session.query(Customer, IndividualCustomer)
-            .join(
-                IndividualCustomer,
-                Customer.PersonID == IndividualCustomer.BusinessEntityID,
-            )
-            .limit(5)
-            .all()
-        )
-
-        print("Individual Customers:")
-        for customer, individual in customers_with_details:
-            print(f"  Customer ID: {customer.CustomerID}")
-            print(f"    Name: {individual.FirstName} {individual.LastName}")
-            print(f"    City: {individual.City}")
-            print()
-
-        # Query store customers by joining on StoreID = BusinessEntityID
-        store_customers = (
-            session.query(Customer, StoreCustomer)
-            .join(
-                StoreCustomer,
-                Customer.StoreID == StoreCustomer.BusinessEntityID,
-            )
-            .limit(5)
-            .all()
-        )
-
-        print("Store Customers:")
-        for customer, store in store_customers:
-            print(f"  Customer ID: {customer.CustomerID}")
-            print(f"    Store: {store.Name}")
-            print(f"    City: {store.City}")
-            print()
+        customers_with_details = session.execute(CUSTOMER_DETAILS_STMT).all()
+
+        individual_lines = ["Individual Customers:"]
+        store_lines = ["Store Customers:"]
+        for customer, individual, store in customers_with_details:
+            if individual is not None:
+                individual_lines.append(f"  Customer ID: {customer.CustomerID}")
+                individual_lines.append(
+                    f"    Name: {individual.FirstName} {individual.LastName}"
+                )
+                individual_lines.append(f"    City: {individual.City}")
+                individual_lines.append("")
+            if store is not None:
+                store_lines.append(f"  Customer ID: {customer.CustomerID}")
+                store_lines.append(f"    Store: {store.Name}")
+                store_lines.append(f"    City: {store.City}")
+                store_lines.append("")
+        print("\n".join(individual_lines + store_lines))
 
 
 def example_complex_query():
     """Example: Complex query with filters and aggregations."""
     with get_db_session() as session:
-        from sqlalchemy import func
-
         # Get total sales by territory
-        results = (
-            session.query(
-                SalesTerritory.Name,
-                func.sum(SalesOrderHeader.TotalDue).label("total_sales"),
-                func.count(SalesOrderHeader.SalesOrderID).label("order_count"),
-            )
-            .join(SalesOrderHeader)
-            .group_by(SalesTerritory.TerritoryID)
-            .all()
-        )
+        results = session.execute(SALES_BY_TERRITORY_STMT).all()
 
-        print("Sales by Territory:")
+        lines = ["Sales by Territory:"]
         for territory_name, total_sales, order_count in results:
-            print(f"  {territory_name}: ${total_sales:,.2f} ({order_count} orders)")
+            lines.append(
+                f"  {territory_name}: ${total_sales:,.2f} ({order_count} orders)"
+            )
+        print("\n".join(lines))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+"""
+On-disk cache of LLM extraction results keyed by the SHA-256 of the document bytes.
+Re-uploading the same file returns the cached result instead of re-running OCR/LLM calls.
+"""
+
+import hashlib
+import os
+
+from diskcache import Cache
+
+# Directory holding the cache database
+# Can be overridden via environment variable EXTRACTION_CACHE_DIR
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", ".extract_cache")
+
+# Seconds a cached extraction stays valid (default 30 days)
+# Can be overridden via environment variable EXTRACTION_CACHE_TTL
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", 30 * 86400))
+
+# diskcache is safe to share across threads and processes (Flask, Celery workers)
+_cache = Cache(EXTRACTION_CACHE_DIR)
+
+
+def extraction_cache_key(namespace: str, data: bytes) -> str:
+    """
+    Build a cache key from the document bytes.
+
+    Args:
+        namespace: Name of the extraction pipeline, so pipelines that return
+            different shapes for the same file do not share entries
+        data: Raw document bytes
+
+    Returns:
+        str: Cache key
+    """
+    return f"{namespace}:{hashlib.sha256(data).hexdigest()}"
+
+
+def get_cached_extraction(key: str):
+    """
+    Look up a cached extraction result.
+
+    Args:
+        key: Key from extraction_cache_key
+
+    Returns:
+        The cached result, or None on a miss
+    """
+    return _cache.get(key)
+
+
+def set_cached_extraction(key: str, value) -> None:
+    """
+    Store an extraction result.
+
+    Args:
+        key: Key from extraction_cache_key
+        value: Picklable extraction result
+    """
+    _cache.set(key, value, expire=EXTRACTION_CACHE_TTL)
@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the invoice extractor API.
+Used automatically when gunicorn is started from this directory: gunicorn app:app
+"""
+
+import multiprocessing
+import os
+
+# Address to listen on
+# Can be overridden via environment variable PORT
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# One process per CPU, each serving requests from a thread pool so slow
+# database calls don't block the rest of the worker
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# Uploads are handed off to Celery, but large files can still take a while to stream in
+timeout = 120
+
+# Log to stdout/stderr
+accesslog = "-"
+errorlog = "-"
@@ -1,7 +1,12 @@
 # initialize the database
 
 # Import the Case Study Data.xlsx file and print the first 5 rows in each sheet
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
 
 # First, drop and recreate all tables using the models (ensures correct schema)
 # This clears any existing data to avoid duplicate key errors
@@ -17,57 +22,204 @@ from models import (
     SalesTerritory,
     StoreCustomer,
 )
+from sqlalchemy import Boolean, DateTime, Float, Integer
+
+# Workbook loaded into the database
+EXCEL_PATH = Path("Case Study Data.xlsx")
+
+# Parsed sheets are cached here as Parquet, keyed by the workbook's size and
+# modification time, so re-runs on an unchanged workbook skip xlsx parsing
+SHEET_CACHE_DIR = Path(".cache")
+
+# Rows sent per batch of INSERTs
+INSERT_CHUNK_SIZE = 5000
+
+
+def iter_records(dataframe: pd.DataFrame, chunksize: int):
+    """
+    Yield a DataFrame as batches of row dicts for Core executemany INSERTs.
+    Rows are built from an Arrow copy of the frame, which converts whole
+    columns to Python values in C++ instead of cell by cell through pandas.
+    Missing values (NaN, NaT, pd.NA) become None so they are stored as NULL.
+
+    Args:
+        dataframe: Parsed sheet
+        chunksize: Rows per batch
+
+    Yields:
+        list[dict]: Rows keyed by column name
+    """
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield batch.to_pylist()
+
 
-print("Dropping existing tables (if any)...")
-Base.metadata.drop_all(bind=engine)
-
-print("Creating database tables from models...")
-init_db()
-print("Tables created successfully!")
-
-# Read the Excel file
-print("\nReading Excel file...")
-# header=0 means use first row as column names (skip it from data)
-df = pd.read_excel("Case Study Data.xlsx", sheet_name=None, header=0)
-
-print("\nExcel sheets found:")
-for sheet in df.keys():
-    print(f"  - {sheet}")
-    print(f"    Rows: {len(df[sheet])}")
-    print(f"    Columns: {list(df[sheet].columns)}")
-    print("    First 5 rows:")
-    print(df[sheet].head())
-    print()
-
-# Map Excel sheet names to model classes
-# This ensures data goes into the correct tables with proper schema
-sheet_to_model = {
-    "ProductCategory": ProductCategory,
-    "ProductSubCategory": ProductSubCategory,
-    "Product": Product,
-    "SalesTerritory": SalesTerritory,
-    "Customers": Customer,
-    "IndividualCustomers": IndividualCustomer,
-    "StoreCustomers": StoreCustomer,
-    "SalesOrderHeader": SalesOrderHeader,
-    "SalesOrderDetail": SalesOrderDetail,
-}
-
-# Load data into tables
-print("Loading data into database...")
-try:
-    for sheet_name, dataframe in df.items():
-        if sheet_name in sheet_to_model:
-            print(f"Loading {sheet_name}...")
-            # Use if_exists='append' since tables are already created and empty
-            dataframe.to_sql(sheet_name, engine, if_exists="append", index=False)
-            print(f"  ✓ Loaded {len(dataframe)} rows into {sheet_name}")
+def sheet_dtypes(model) -> tuple[dict, list]:
+    """
+    Build read_excel dtypes from a model's column types, so pandas does not
+    infer (and later re-coerce) each column.
+
+    Args:
+        model: ORM model class the sheet is loaded into
+
+    Returns:
+        tuple: dtype mapping for read_excel and names of the datetime columns
+    """
+    dtype = {}
+    date_columns = []
+    for column in model.__table__.columns:
+        if isinstance(column.type, DateTime):
+            date_columns.append(column.key)
+        elif isinstance(column.type, Boolean):
+            dtype[column.key] = "boolean"
+        elif isinstance(column.type, Integer):
+            dtype[column.key] = "Int64"
+        elif isinstance(column.type, Float):
+            dtype[column.key] = "float64"
         else:
+            dtype[column.key] = "string"
+    return dtype, date_columns
+
+
+def sheet_cache_path(sheet_name: str, dtype: dict, date_columns: list) -> Path:
+    """
+    Build the Parquet cache path of a parsed sheet.
+    The path changes whenever the workbook or the model's column types change.
+
+    Args:
+        sheet_name: Name of the sheet
+        dtype: dtype mapping the sheet is parsed with
+        date_columns: Names of the datetime columns
+
+    Returns:
+        Path: Cache file path
+    """
+    stat = EXCEL_PATH.stat()
+    schema = hashlib.sha256(repr((dtype, date_columns)).encode()).hexdigest()[:12]
+    return SHEET_CACHE_DIR / (
+        f"{EXCEL_PATH.stem}-{stat.st_size}-{stat.st_mtime_ns}-{sheet_name}-{schema}"
+        ".parquet"
+    )
+
+
+def read_sheet(excel_file: pd.ExcelFile, sheet_name: str, model) -> pd.DataFrame:
+    """
+    Parse one sheet of the workbook with dtypes matching its model.
+    Served from the Parquet cache when the workbook is unchanged.
+
+    Args:
+        excel_file: Open workbook
+        sheet_name: Name of the sheet to parse
+        model: ORM model class the sheet is loaded into
+
+    Returns:
+        DataFrame: Parsed sheet
+    """
+    dtype, date_columns = sheet_dtypes(model)
+    cache_path = sheet_cache_path(sheet_name, dtype, date_columns)
+    if cache_path.exists():
+        return pd.read_parquet(cache_path)
+
+    # header=0 means use first row as column names (skip it from data)
+    dataframe = pd.read_excel(excel_file, sheet_name=sheet_name, header=0, dtype=dtype)
+    for column in date_columns:
+        if column in dataframe:
+            dataframe[column] = pd.to_datetime(dataframe[column])
+
+    # Write to a temporary file first so an interrupted run leaves no partial cache
+    SHEET_CACHE_DIR.mkdir(exist_ok=True)
+    temp_path = cache_path.with_suffix(".tmp")
+    dataframe.to_parquet(temp_path, compression="zstd")
+    temp_path.replace(cache_path)
+    return dataframe
+
+
+def main():
+    """Recreate the database schema and load every mapped sheet of the workbook."""
+    print("Dropping existing tables (if any)...")
+    Base.metadata.drop_all(bind=engine)
+
+    print("Creating database tables from models...")
+    init_db()
+    print("Tables created successfully!")
+
+    # Open the Excel file
+    # calamine (Rust) parses xlsx several times faster than openpyxl; sheets are
+    # parsed while loading instead of all up front
+    print("\nReading Excel file...")
+    excel_file = pd.ExcelFile(EXCEL_PATH, engine="calamine")
+
+    print("\nExcel sheets found:")
+    for sheet in excel_file.sheet_names:
+        print(f"  - {sheet}")
+
+    # Map Excel sheet names to model classes
+    # This ensures data goes into the correct tables with proper schema
+    sheet_to_model = {
+        "ProductCategory": ProductCategory,
+        "ProductSubCategory": ProductSubCategory,
+        "Product": Product,
+        "SalesTerritory": SalesTerritory,
+        "Customers": Customer,
+        "IndividualCustomers": IndividualCustomer,
+        "StoreCustomers": StoreCustomer,
+        "SalesOrderHeader": SalesOrderHeader,
+        "SalesOrderDetail": SalesOrderDetail,
+    }
+
+    # Only sheets with a matching model are parsed
+    for sheet_name in excel_file.sheet_names:
+        if sheet_name not in sheet_to_model:
             print(f"  ⚠ Skipping {sheet_name} (no matching model found)")
+    sheet_names = [name for name in excel_file.sheet_names if name in sheet_to_model]
+
+    # Load data into tables
+    # All sheets are written in a single transaction: one commit (and fsync on
+    # SQLite) for the whole load, and a failed load leaves no partial data behind
+    # The next sheet is parsed on a reader thread while the current one is
+    # inserted, and each sheet is released once written, so at most two
+    # sheets are held in memory at a time
+    print("Loading data into database...")
+    try:
+        with ThreadPoolExecutor(max_workers=1) as reader, engine.begin() as connection:
+            pending = None
+            if sheet_names:
+                pending = reader.submit(
+                    read_sheet,
+                    excel_file,
+                    sheet_names[0],
+                    sheet_to_model[sheet_names[0]],
+                )
+            for index, sheet_name in enumerate(sheet_names):
+                print(f"Loading {sheet_name}...")
+                dataframe = pending.result()
+                if index + 1 < len(sheet_names):
+                    next_sheet = sheet_names[index + 1]
+                    pending = reader.submit(
+                        read_sheet, excel_file, next_sheet, sheet_to_model[next_sheet]
+                    )
+
+                print(f"    Rows: {len(dataframe)}")
+                print(f"    Columns: {list(dataframe.columns)}")
+                print("    First 5 rows:")
+                print(dataframe.head())
+
+                # Core executemany INSERTs into the model's table skip the ORM unit of
+                # work and pandas' per-chunk table reflection; SQLAlchemy batches
+                # them into multi-row VALUES statements where the driver supports it
+                insert_statement = sheet_to_model[sheet_name].__table__.insert()
+                for records in iter_records(dataframe, INSERT_CHUNK_SIZE):
+                    connection.execute(insert_statement, records)
+                print(f"  ✓ Loaded {len(dataframe)} rows into {sheet_name}")
+                del dataframe
+
+        print("\n✓ Database initialization completed successfully!")
+    except Exception as e:
+        print(f"\n✗ Error initializing database: {e}")
+        raise
+    finally:
+        engine.dispose()
+
 
-    print("\n✓ Database initialization completed successfully!")
-except Exception as e:
-    print(f"\n✗ Error initializing database: {e}")
-    raise
-finally:
-    engine.dispose()
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,16 @@ from datetime import datetime
 from typing import Optional
 
 from db import Base
-from sqlalchemy import BigInteger, Boolean, DateTime, Float, ForeignKey, Integer, Text
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
@@ -16,12 +25,15 @@ class ProductCategory(Base):
 
     __tablename__ = "ProductCategory"
 
-    ProductCategoryID: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    Name: Mapped[Optional[str]] = mapped_column(Text)
+    ProductCategoryID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Name: Mapped[Optional[str]] = mapped_column(String(50))
 
     # Relationships
     subcategories: Mapped[list["ProductSubCategory"]] = relationship(
-        "ProductSubCategory", back_populates="category"
+        "ProductSubCategory",
+        back_populates="category",
+        lazy="raise_on_sql",
+        passive_deletes=True,
     )
 
 
@@ -29,19 +41,26 @@ class ProductSubCategory(Base):
     """Product subcategory model."""
 
     __tablename__ = "ProductSubCategory"
+    __table_args__ = (
+        # Foreign keys are not indexed automatically; used by category joins
+        Index("ix_productsubcategory_productcategoryid", "ProductCategoryID"),
+    )
 
-    ProductSubcategoryID: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    ProductSubcategoryID: Mapped[int] = mapped_column(Integer, primary_key=True)
     ProductCategoryID: Mapped[int] = mapped_column(
-        BigInteger, ForeignKey("ProductCategory.ProductCategoryID")
+        Integer, ForeignKey("ProductCategory.ProductCategoryID")
     )
-    Name: Mapped[Optional[str]] = mapped_column(Text)
+    Name: Mapped[Optional[str]] = mapped_column(String(50))
 
     # Relationships
     category: Mapped["ProductCategory"] = relationship(
         "ProductCategory", back_populates="subcategories"
     )
     products: Mapped[list["Product"]] = relationship(
-        "Product", back_populates="subcategory"
+        "Product",
+        back_populates="subcategory",
+        lazy="raise_on_sql",
+        passive_deletes=True,
     )
 
 
@@ -49,30 +68,34 @@ class Product(Base):
     """Product model."""
 
     __tablename__ = "Product"
+    __table_args__ = (Index("ix_product_productsubcategoryid", "ProductSubcategoryID"),)
 
-    ProductID: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    Name: Mapped[Optional[str]] = mapped_column(Text)
-    ProductNumber: Mapped[Optional[str]] = mapped_column(Text)
+    ProductID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Name: Mapped[Optional[str]] = mapped_column(String(50))
+    ProductNumber: Mapped[Optional[str]] = mapped_column(String(25))
     MakeFlag: Mapped[Optional[bool]] = mapped_column(Boolean)
     FinishedGoodsFlag: Mapped[Optional[bool]] = mapped_column(Boolean)
-    Color: Mapped[Optional[str]] = mapped_column(Text)
+    Color: Mapped[Optional[str]] = mapped_column(String(15))
     StandardCost: Mapped[Optional[float]] = mapped_column(Float)
     ListPrice: Mapped[Optional[float]] = mapped_column(Float)
-    Size: Mapped[Optional[str]] = mapped_column(Text)
-    ProductLine: Mapped[Optional[str]] = mapped_column(Text)
-    Class: Mapped[Optional[str]] = mapped_column(Text)
-    Style: Mapped[Optional[str]] = mapped_column(Text)
-    ProductSubcategoryID: Mapped[Optional[float]] = mapped_column(
-        Float, ForeignKey("ProductSubCategory.ProductSubcategoryID")
+    Size: Mapped[Optional[str]] = mapped_column(String(5))
+    ProductLine: Mapped[Optional[str]] = mapped_column(String(2))
+    Class: Mapped[Optional[str]] = mapped_column(String(2))
+    Style: Mapped[Optional[str]] = mapped_column(String(2))
+    ProductSubcategoryID: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("ProductSubCategory.ProductSubcategoryID")
     )
-    ProductModelID: Mapped[Optional[float]] = mapped_column(Float)
+    ProductModelID: Mapped[Optional[int]] = mapped_column(Integer)
 
     # Relationships
     subcategory: Mapped[Optional["ProductSubCategory"]] = relationship(
         "ProductSubCategory", back_populates="products"
     )
     order_details: Mapped[list["SalesOrderDetail"]] = relationship(
-        "SalesOrderDetail", back_populates="product"
+        "SalesOrderDetail",
+        back_populates="product",
+        lazy="raise_on_sql",
+        passive_deletes=True,
     )
 
 
@@ -81,17 +104,23 @@ class SalesTerritory(Base):
 
     __tablename__ = "SalesTerritory"
 
-    TerritoryID: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    Name: Mapped[Optional[str]] = mapped_column(Text)
-    CountryRegionCode: Mapped[Optional[str]] = mapped_column(Text)
-    Group: Mapped[Optional[str]] = mapped_column(Text)
+    TerritoryID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Name: Mapped[Optional[str]] = mapped_column(String(50))
+    CountryRegionCode: Mapped[Optional[str]] = mapped_column(String(3))
+    Group: Mapped[Optional[str]] = mapped_column(String(50))
 
     # Relationships
     sales_orders: Mapped[list["SalesOrderHeader"]] = relationship(
-        "SalesOrderHeader", back_populates="territory"
+        "SalesOrderHeader",
+        back_populates="territory",
+        lazy="raise_on_sql",
+        passive_deletes=True,
     )
     customers: Mapped[list["Customer"]] = relationship(
-        "Customer", back_populates="territory"
+        "Customer",
+        back_populates="territory",
+        lazy="raise_on_sql",
+        passive_deletes=True,
     )
 
 
@@ -99,25 +128,34 @@ class Customer(Base):
     """Customer model."""
 
     __tablename__ = "Customers"
+    __table_args__ = (
+        Index("ix_customers_territoryid", "TerritoryID"),
+        # Join keys to IndividualCustomers / StoreCustomers
+        Index("ix_customers_personid", "PersonID"),
+        Index("ix_customers_storeid", "StoreID"),
+    )
 
-    CustomerID: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    PersonID: Mapped[Optional[float]] = mapped_column(
-        Float
+    CustomerID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    PersonID: Mapped[Optional[int]] = mapped_column(
+        Integer
     )  # Links to IndividualCustomers.BusinessEntityID
-    StoreID: Mapped[Optional[float]] = mapped_column(
-        Float
+    StoreID: Mapped[Optional[int]] = mapped_column(
+        Integer
     )  # Links to StoreCustomers.BusinessEntityID
     TerritoryID: Mapped[int] = mapped_column(
-        BigInteger, ForeignKey("SalesTerritory.TerritoryID")
+        Integer, ForeignKey("SalesTerritory.TerritoryID")
     )
-    AccountNumber: Mapped[Optional[str]] = mapped_column(Text)
+    AccountNumber: Mapped[Optional[str]] = mapped_column(String(10))
 
     # Relationships
     territory: Mapped["SalesTerritory"] = relationship(
         "SalesTerritory", back_populates="customers"
     )
     sales_orders: Mapped[list["SalesOrderHeader"]] = relationship(
-        "SalesOrderHeader", back_populates="customer"
+        "SalesOrderHeader",
+        back_populates="customer",
+        lazy="raise_on_sql",
+        passive_deletes=True,
     )
 
     # Note: IndividualCustomer and StoreCustomer relationships are implicit
@@ -133,17 +171,17 @@ class IndividualCustomer(Base):
     id: Mapped[Optional[int]] = mapped_column(
         Integer, primary_key=True, autoincrement=True
     )
-    BusinessEntityID: Mapped[Optional[int]] = mapped_column(BigInteger)
-    FirstName: Mapped[Optional[str]] = mapped_column(Text)
-    MiddleName: Mapped[Optional[str]] = mapped_column(Text)
-    LastName: Mapped[Optional[str]] = mapped_column(Text)
-    AddressType: Mapped[Optional[str]] = mapped_column(Text)
-    AddressLine1: Mapped[Optional[str]] = mapped_column(Text)
-    AddressLine2: Mapped[Optional[str]] = mapped_column(Text)
-    City: Mapped[Optional[str]] = mapped_column(Text)
-    StateProvinceName: Mapped[Optional[str]] = mapped_column(Text)
-    PostalCode: Mapped[Optional[str]] = mapped_column(Text)
-    CountryRegionName: Mapped[Optional[str]] = mapped_column(Text)
+    BusinessEntityID: Mapped[Optional[int]] = mapped_column(Integer)
+    FirstName: Mapped[Optional[str]] = mapped_column(String(50))
+    MiddleName: Mapped[Optional[str]] = mapped_column(String(50))
+    LastName: Mapped[Optional[str]] = mapped_column(String(50))
+    AddressType: Mapped[Optional[str]] = mapped_column(String(50))
+    AddressLine1: Mapped[Optional[str]] = mapped_column(String(60))
+    AddressLine2: Mapped[Optional[str]] = mapped_column(String(60))
+    City: Mapped[Optional[str]] = mapped_column(String(30))
+    StateProvinceName: Mapped[Optional[str]] = mapped_column(String(50))
+    PostalCode: Mapped[Optional[str]] = mapped_column(String(15))
+    CountryRegionName: Mapped[Optional[str]] = mapped_column(String(50))
 
     # Note: Relationship to Customer is implicit via
     # BusinessEntityID = Customer.PersonID
@@ -153,6 +191,14 @@ class IndividualCustomer(Base):
     # )
 
 
+# Case-insensitive name lookups used when matching extracted customer names
+Index(
+    "ix_individualcustomers_name_lower",
+    func.lower(IndividualCustomer.FirstName),
+    func.lower(IndividualCustomer.LastName),
+)
+
+
 class StoreCustomer(Base):
     """Store customer details model."""
 
@@ -161,15 +207,15 @@ class StoreCustomer(Base):
     id: Mapped[Optional[int]] = mapped_column(
         Integer, primary_key=True, autoincrement=True
     )
-    BusinessEntityID: Mapped[Optional[int]] = mapped_column(BigInteger)
-    Name: Mapped[Optional[str]] = mapped_column(Text)
-    AddressType: Mapped[Optional[str]] = mapped_column(Text)
-    AddressLine1: Mapped[Optional[str]] = mapped_column(Text)
-    AddressLine2: Mapped[Optional[str]] = mapped_column(Text)
-    City: Mapped[Optional[str]] = mapped_column(Text)
-    StateProvinceName: Mapped[Optional[str]] = mapped_column(Text)
-    PostalCode: Mapped[Optional[str]] = mapped_column(Text)
-    CountryRegionName: Mapped[Optional[str]] = mapped_column(Text)
+    BusinessEntityID: Mapped[Optional[int]] = mapped_column(Integer)
+    Name: Mapped[Optional[str]] = mapped_column(String(50))
+    AddressType: Mapped[Optional[str]] = mapped_column(String(50))
+    AddressLine1: Mapped[Optional[str]] = mapped_column(String(60))
+    AddressLine2: Mapped[Optional[str]] = mapped_column(String(60))
+    City: Mapped[Optional[str]] = mapped_column(String(30))
+    StateProvinceName: Mapped[Optional[str]] = mapped_column(String(50))
+    PostalCode: Mapped[Optional[str]] = mapped_column(String(15))
+    CountryRegionName: Mapped[Optional[str]] = mapped_column(String(50))
 
     # Note: Relationship to Customer is implicit via
     # BusinessEntityID = Customer.StoreID
@@ -179,36 +225,48 @@ class StoreCustomer(Base):
     # )
 
 
+# Case-insensitive name lookups used when matching extracted customer names
+Index("ix_storecustomers_name_lower", func.lower(StoreCustomer.Name))
+
+
 class SalesOrderHeader(Base):
     """Sales order header model."""
 
     __tablename__ = "SalesOrderHeader"
+    __table_args__ = (
+        # Composite indexes for the common /sales_orders sorts. SalesOrderID is the
+        # tie-breaker, so OFFSET and keyset pages can be walked in index order
+        Index("ix_soh_orderdate_id", "OrderDate", "SalesOrderID"),
+        Index("ix_soh_duedate_id", "DueDate", "SalesOrderID"),
+        Index("ix_soh_customerid_id", "CustomerID", "SalesOrderID"),
+        Index("ix_soh_totaldue_id", "TotalDue", "SalesOrderID"),
+        # Join key for per-territory aggregates
+        Index("ix_soh_territoryid", "TerritoryID"),
+    )
 
     SalesOrderID: Mapped[Optional[int]] = mapped_column(
         Integer, primary_key=True, autoincrement=True
     )
-    RevisionNumber: Mapped[Optional[int]] = mapped_column(BigInteger)
+    RevisionNumber: Mapped[Optional[int]] = mapped_column(Integer)
     OrderDate: Mapped[Optional[datetime]] = mapped_column(DateTime)
     DueDate: Mapped[Optional[datetime]] = mapped_column(DateTime)
     ShipDate: Mapped[Optional[datetime]] = mapped_column(DateTime)
-    Status: Mapped[Optional[int]] = mapped_column(BigInteger)
+    Status: Mapped[Optional[int]] = mapped_column(Integer)
     OnlineOrderFlag: Mapped[Optional[bool]] = mapped_column(Boolean)
-    SalesOrderNumber: Mapped[Optional[str]] = mapped_column(Text)
-    PurchaseOrderNumber: Mapped[Optional[str]] = mapped_column(Text)
-    AccountNumber: Mapped[Optional[str]] = mapped_column(Text)
-    CustomerID: Mapped[int] = mapped_column(
-        BigInteger, ForeignKey("Customers.CustomerID")
-    )
-    SalesPersonID: Mapped[Optional[float]] = mapped_column(Float)
+    SalesOrderNumber: Mapped[Optional[str]] = mapped_column(String(25))
+    PurchaseOrderNumber: Mapped[Optional[str]] = mapped_column(String(25))
+    AccountNumber: Mapped[Optional[str]] = mapped_column(String(15))
+    CustomerID: Mapped[int] = mapped_column(Integer, ForeignKey("Customers.CustomerID"))
+    SalesPersonID: Mapped[Optional[int]] = mapped_column(Integer)
     TerritoryID: Mapped[int] = mapped_column(
-        BigInteger, ForeignKey("SalesTerritory.TerritoryID")
-    )
-    BillToAddressID: Mapped[Optional[int]] = mapped_column(BigInteger)
-    ShipToAddressID: Mapped[Optional[int]] = mapped_column(BigInteger)
-    ShipMethodID: Mapped[Optional[int]] = mapped_column(BigInteger)
-    CreditCardID: Mapped[Optional[float]] = mapped_column(Float)
-    CreditCardApprovalCode: Mapped[Optional[str]] = mapped_column(Text)
-    CurrencyRateID: Mapped[Optional[float]] = mapped_column(Float)
+        Integer, ForeignKey("SalesTerritory.TerritoryID")
+    )
+    BillToAddressID: Mapped[Optional[int]] = mapped_column(Integer)
+    ShipToAddressID: Mapped[Optional[int]] = mapped_column(Integer)
+    ShipMethodID: Mapped[Optional[int]] = mapped_column(Integer)
+    CreditCardID: Mapped[Optional[int]] = mapped_column(Integer)
+    CreditCardApprovalCode: Mapped[Optional[str]] = mapped_column(String(15))
+    CurrencyRateID: Mapped[Optional[int]] = mapped_column(Integer)
     SubTotal: Mapped[Optional[float]] = mapped_column(Float)
     TaxAmt: Mapped[Optional[float]] = mapped_column(Float)
     Freight: Mapped[Optional[float]] = mapped_column(Float)
@@ -222,7 +280,11 @@ class SalesOrderHeader(Base):
         "SalesTerritory", back_populates="sales_orders"
     )
     order_details: Mapped[list["SalesOrderDetail"]] = relationship(
-        "SalesOrderDetail", back_populates="order_header"
+        "SalesOrderDetail",
+        back_populates="order_header",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise_on_sql",
     )
 
 
@@ -230,17 +292,24 @@ class SalesOrderDetail(Base):
     """Sales order detail (line items) model."""
 
     __tablename__ = "SalesOrderDetail"
+    __table_args__ = (
+        # Line items are looked up by order (lazy/selectin loads, order detail
+        # pages) and listed in SalesOrderDetailID order within it
+        Index("ix_sod_salesorderid_id", "SalesOrderID", "SalesOrderDetailID"),
+        # Join key to Product
+        Index("ix_sod_productid", "ProductID"),
+    )
 
     SalesOrderID: Mapped[int] = mapped_column(
-        BigInteger, ForeignKey("SalesOrderHeader.SalesOrderID")
+        Integer, ForeignKey("SalesOrderHeader.SalesOrderID", ondelete="CASCADE")
     )
     SalesOrderDetailID: Mapped[Optional[int]] = mapped_column(
         Integer, primary_key=True, autoincrement=True
     )
-    CarrierTrackingNumber: Mapped[Optional[str]] = mapped_column(Text)
-    OrderQty: Mapped[Optional[int]] = mapped_column(BigInteger)
-    ProductID: Mapped[int] = mapped_column(BigInteger, ForeignKey("Product.ProductID"))
-    SpecialOfferID: Mapped[Optional[int]] = mapped_column(BigInteger)
+    CarrierTrackingNumber: Mapped[Optional[str]] = mapped_column(String(25))
+    OrderQty: Mapped[Optional[int]] = mapped_column(Integer)
+    ProductID: Mapped[int] = mapped_column(Integer, ForeignKey("Product.ProductID"))
+    SpecialOfferID: Mapped[Optional[int]] = mapped_column(Integer)
     UnitPrice: Mapped[Optional[float]] = mapped_column(Float)
     UnitPriceDiscount: Mapped[Optional[float]] = mapped_column(Float)
     LineTotal: Mapped[Optional[float]] = mapped_column(Float)
@@ -0,0 +1,115 @@
+"""
+Chat completion requests run through the OpenAI Batch API, shared by the extraction
+pipelines. Batch requests cost half as much as synchronous ones and use a separate
+rate limit pool, at the price of up to 24 hours turnaround.
+"""
+
+import time
+from collections.abc import Iterator
+
+import orjson
+
+# Endpoint every batched request is sent to
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Time the API has to finish a batch; 24h is the only window it offers
+BATCH_COMPLETION_WINDOW = "24h"
+
+# Seconds between status checks of a submitted batch
+BATCH_POLL_INTERVAL = 60
+
+# Batch statuses after which the batch no longer changes
+BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+def submit_batch(
+    client, requests: list[tuple[str, dict]], metadata: dict | None = None
+) -> str:
+    """
+    Upload chat completion requests as a JSONL file and start a batch over them.
+
+    Args:
+        client: OpenAI client to submit with
+        requests: (custom_id, request body) pairs; the custom_id identifies the
+            response to each request
+        metadata: Optional string metadata stored with the batch
+
+    Returns:
+        str: Batch ID
+    """
+    lines = [
+        orjson.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body,
+            }
+        )
+        for custom_id, body in requests
+    ]
+    batch_file = client.files.create(
+        file=("batch.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata=metadata,
+    )
+    return batch.id
+
+
+def wait_for_batch(client, batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL):
+    """
+    Poll a batch until it reaches a final status.
+
+    Args:
+        client: OpenAI client to poll with
+        batch_id: ID returned by submit_batch
+        poll_interval: Seconds between status checks
+
+    Returns:
+        Batch: The completed batch
+
+    Raises:
+        ValueError: If the batch failed, expired or was cancelled
+    """
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in BATCH_FINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch_id)
+
+    if batch.status != "completed":
+        raise ValueError(f"Batch {batch_id} ended with status {batch.status}")
+    return batch
+
+
+def batch_results(client, batch) -> Iterator[tuple[str, str | None]]:
+    """
+    Read the responses of a completed batch.
+    Failed requests are only listed in the batch's error file, so they are
+    missing here rather than reported.
+
+    Args:
+        client: OpenAI client to download with
+        batch: Completed batch returned by wait_for_batch
+
+    Yields:
+        tuple: (custom_id, message content), with None as the content of requests
+            that returned an error status
+    """
+    if not batch.output_file_id:
+        return
+    output = client.files.content(batch.output_file_id).text
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        response = result.get("response")
+        if response and response["status_code"] == 200:
+            content = response["body"]["choices"][0]["message"]["content"]
+        else:
+            content = None
+        yield result["custom_id"], content
@@ -7,14 +7,34 @@ directly from images and PDFs in a single step using GPT-4 Vision API.
 import base64
 import json
 import os
+import re
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from io import BytesIO
 
 import openai
+import orjson
+from customer_matching import match_customer
 from db import get_db_session
 from dotenv import load_dotenv
+from extraction_cache import (
+    extraction_cache_key,
+    get_cached_extraction,
+    set_cached_extraction,
+)
 from models import Customer, IndividualCustomer, Product, StoreCustomer
-from PIL import Image
-from pypdf import PdfReader
+from openai_batch import (
+    BATCH_POLL_INTERVAL,
+    batch_results,
+    submit_batch,
+    wait_for_batch,
+)
+from PIL import Image, ImageOps
+from sqlalchemy import select
 
 # Load environment variables
 load_dotenv()
@@ -27,42 +47,96 @@ if not OPENAI_API_KEY:
         "Set it in .env file or environment."
     )
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# One client is shared by every thread, so concurrent page and batch requests
+# reuse its keep-alive connection pool
+# Transient API errors are retried by the client with exponential backoff
+client = openai.OpenAI(api_key=OPENAI_API_KEY, max_retries=3, timeout=120.0)
 
+# Account rate limits for chat completions, shared by the threads of this process
+# Requests are paced below them instead of hitting 429 errors and retry backoff
+# Can be overridden via environment variables OPENAI_RPM and OPENAI_TPM
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", 500))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", 100000))
 
-def image_to_base64(image: Image.Image) -> str:
-    """
-    Convert a PIL Image to base64-encoded string.
-
-    Args:
-        image: PIL Image object
 
-    Returns:
-        str: Base64-encoded image string
-    """
-    buffered = BytesIO()
-    # Convert to RGB if necessary (for PNG with transparency)
-    if image.mode in ("RGBA", "LA", "P"):
-        rgb_image = Image.new("RGB", image.size, (255, 255, 255))
-        if image.mode == "P":
-            image = image.convert("RGBA")
-        rgb_image.paste(
-            image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None
-        )
-        image = rgb_image
-    image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return img_str
+class _RateLimiter:
+    """Thread-safe token bucket refilled continuously up to a per-minute limit."""
 
+    def __init__(self, per_minute: int):
+        self._capacity = float(per_minute)
+        self._tokens = float(per_minute)
+        self._rate = per_minute / 60
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
 
-def create_extraction_prompt() -> str:
-    """
-    Create a prompt for OpenAI GPT Vision to extract invoice data directly from image.
-
-    Returns:
-        str: Formatted prompt for GPT Vision
-    """
-    prompt = """You are an expert at extracting structured data from invoices and sales documents.
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> None:
+        """
+        Block until the bucket holds at least amount tokens, then take them.
+
+        Args:
+            amount: Number of tokens to take
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def consume(self, amount: float) -> None:
+        """
+        Take tokens without waiting; the balance may go negative.
+
+        Args:
+            amount: Number of tokens to take
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+_request_limiter = _RateLimiter(OPENAI_RPM)
+# Token usage is only known once a response arrives, so it is charged afterwards
+# and later requests wait until the bucket is out of debt
+_token_limiter = _RateLimiter(OPENAI_TPM)
+
+# Version of the extraction prompt and response handling, part of the cache key
+# Bump it when either changes so results cached for the old version are not reused
+EXTRACTION_PROMPT_VERSION = 1
+
+# Maximum number of PDF pages sent to the Vision API concurrently
+# Can be overridden via environment variable VISION_MAX_WORKERS
+VISION_MAX_WORKERS = int(os.getenv("VISION_MAX_WORKERS", 8))
+
+# Maximum number of invoice images sent in one request by extract_data_from_images_batch
+# More images per request amortize the prompt further but make a failed
+# response more expensive to retry
+IMAGES_PER_REQUEST = 5
+
+# Resolution for rendering scanned PDF pages; GPT-4o downsamples larger images
+PDF_RENDER_DPI = 150
+
+# Number of pdftoppm processes used by the pdf2image fallback renderer
+PDF_RENDER_THREADS = max(1, (os.cpu_count() or 1) - 1)
+
+# JPEG quality for images sent to the Vision API
+JPEG_QUALITY = 85
+
+# Longest edge, in pixels, of images sent to the Vision API
+# GPT-4o scales larger images down to fit this bound anyway
+MAX_IMAGE_DIMENSION = 2048
+
+# Extraction instructions for GPT Vision, sent ahead of the document image or text
+EXTRACTION_PROMPT = """You are an expert at extracting structured data from invoices and sales documents.
 
 Analyze this invoice/sales document image and extract all relevant information. Return the data as a JSON object with the exact structure specified below.
 
@@ -104,7 +178,213 @@ Important extraction guidelines:
 - Extract the Freight/Shipping value from the invoice and set it to the "Freight" field
 
 Return ONLY valid JSON, no additional text, markdown formatting, or commentary."""
-    return prompt
+
+
+def image_to_base64(image: Image.Image, format: str = "JPEG") -> str:
+    """
+    Convert a PIL Image to base64-encoded string.
+
+    Args:
+        image: PIL Image object
+        format: Output image format; JPEG is several times smaller than PNG
+
+    Returns:
+        str: Base64-encoded image string
+    """
+    buffered = BytesIO()
+    # Convert to RGB if necessary (for PNG with transparency)
+    if image.mode in ("RGBA", "LA", "P"):
+        rgb_image = Image.new("RGB", image.size, (255, 255, 255))
+        if image.mode == "P":
+            image = image.convert("RGBA")
+        rgb_image.paste(
+            image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None
+        )
+        image = rgb_image
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    # Downscale oversized captures; extra resolution only costs tokens and upload time
+    if max(image.size) > MAX_IMAGE_DIMENSION:
+        image = ImageOps.contain(
+            image,
+            (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION),
+            Image.Resampling.LANCZOS,
+        )
+    if format == "JPEG":
+        image.save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    else:
+        image.save(buffered, format=format)
+    img_str = base64.b64encode(buffered.getvalue()).decode()
+    return img_str
+
+
+def encode_image_file(file) -> tuple[str, str]:
+    """
+    Base64-encode an image file for the Vision API.
+    JPEG files and opaque PNG files within MAX_IMAGE_DIMENSION are sent as-is;
+    other images are flattened, downscaled and re-encoded to JPEG by
+    image_to_base64.
+
+    Args:
+        file: File-like object containing image data
+
+    Returns:
+        tuple: Base64-encoded image string and its MIME type
+    """
+    raw_bytes = file.read()
+    # Opening an image only parses its header; pixels are decoded on first use
+    image = Image.open(BytesIO(raw_bytes))
+    if max(image.size) <= MAX_IMAGE_DIMENSION and image.mode in ("RGB", "L"):
+        if image.format == "JPEG":
+            return base64.b64encode(raw_bytes).decode(), "image/jpeg"
+        if image.format == "PNG" and "transparency" not in image.info:
+            return base64.b64encode(raw_bytes).decode(), "image/png"
+    return image_to_base64(image), "image/jpeg"
+
+
+def _build_request(user_content: str | list) -> dict:
+    """
+    Build the chat completion arguments shared by every extraction request.
+
+    Args:
+        user_content: Content of the user message (prompt text, or text and image parts)
+
+    Returns:
+        dict: Keyword arguments for client.chat.completions.create
+    """
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a data extraction expert. Extract structured data from invoices and return only valid JSON.",
+            },
+            {
+                "role": "user",
+                "content": user_content,
+            },
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": 4096,
+        "temperature": 0.1,
+    }
+
+
+def build_image_request(
+    base64_image: str,
+    page_number: int = 1,
+    page_count: int = 1,
+    mime_type: str = "image/jpeg",
+) -> dict:
+    """
+    Build the chat completion arguments for extracting invoice data from an image.
+
+    Args:
+        base64_image: Base64-encoded image
+        page_number: 1-based page number, used in the prompt of multi-page documents
+        page_count: Number of pages in the document
+        mime_type: MIME type of the encoded image
+
+    Returns:
+        dict: Keyword arguments for client.chat.completions.create
+    """
+    prompt = EXTRACTION_PROMPT
+    if page_count > 1:
+        prompt += (
+            f"\n\nNote: This is page {page_number} of a {page_count}-page document. "
+            "Extract all data visible on this page."
+        )
+
+    return _build_request(
+        [
+            {
+                "type": "text",
+                "text": prompt,
+            },
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{mime_type};base64,{base64_image}",
+                },
+            },
+        ]
+    )
+
+
+def build_text_request(text_content: str) -> dict:
+    """
+    Build the chat completion arguments for extracting invoice data from text.
+
+    Args:
+        text_content: Extracted text from document
+
+    Returns:
+        dict: Keyword arguments for client.chat.completions.create
+    """
+    prompt = EXTRACTION_PROMPT + "\n\nDocument text:\n" + text_content
+
+    return _build_request(prompt)
+
+
+# Opening (optionally tagged json) and closing markdown code fences of a response
+_FENCE_RE = re.compile(r"\A\s*(?:```(?:json)?)?\s*|\s*(?:```)?\s*\Z")
+
+
+def _parse_json_response(response_text: str | None) -> dict:
+    """
+    Parse the JSON object returned by the model, removing markdown code fences.
+
+    Args:
+        response_text: Message content of the model response
+
+    Returns:
+        dict: Parsed JSON object
+
+    Raises:
+        ValueError: If the response is empty or not valid JSON
+    """
+    if not response_text:
+        raise ValueError("Empty response from OpenAI API")
+
+    # Clean up response (remove markdown fences and surrounding whitespace if present)
+    response_text = _FENCE_RE.sub("", response_text)
+
+    # Parse JSON
+    try:
+        return orjson.loads(response_text)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(
+            f"Failed to parse OpenAI response as JSON: {str(e)}\nResponse was: {response_text[:500]}"
+        )
+
+
+def _call_and_parse(request: dict, label: str) -> dict:
+    """
+    Send an extraction request to the OpenAI API and parse the JSON it returns.
+
+    Args:
+        request: Keyword arguments for client.chat.completions.create
+        label: Name printed alongside the token usage
+
+    Returns:
+        dict: Extracted structured data with header and line_items
+
+    Raises:
+        ValueError: If the response is empty or not valid JSON
+    """
+    _request_limiter.acquire()
+    _token_limiter.acquire(0)
+    response = client.chat.completions.create(**request)
+
+    # Print token usage
+    if response.usage:
+        usage = response.usage
+        _token_limiter.consume(usage.total_tokens)
+        print(
+            f"[{label}] Token usage - Prompt: {usage.prompt_tokens}, Completion: {usage.completion_tokens}, Total: {usage.total_tokens}"
+        )
+
+    return _parse_json_response(response.choices[0].message.content)
 
 
 def extract_data_from_image_gpt(file) -> dict:
@@ -121,76 +401,277 @@ def extract_data_from_image_gpt(file) -> dict:
         ValueError: If API call fails or image processing fails
     """
     try:
-        # Open and process the image
-        image = Image.open(file)
-        base64_image = image_to_base64(image)
-        prompt = create_extraction_prompt()
+        # Encode the image, reusing the file bytes when no re-encode is needed
+        base64_image, mime_type = encode_image_file(file)
 
         # Call OpenAI GPT-4 Vision API
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a data extraction expert. Extract structured data from invoices and return only valid JSON.",
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt,
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}",
-                            },
-                        },
-                    ],
-                },
-            ],
-            response_format={"type": "json_object"},
-            max_tokens=4096,
-            temperature=0.1,
+        return _call_and_parse(
+            build_image_request(base64_image, mime_type=mime_type),
+            "extract_data_from_image_gpt",
         )
 
-        # Print token usage
-        if response.usage:
-            usage = response.usage
-            print(
-                f"[extract_data_from_image_gpt] Token usage - Prompt: {usage.prompt_tokens}, Completion: {usage.completion_tokens}, Total: {usage.total_tokens}"
-            )
-
-        response_text = response.choices[0].message.content
-        if not response_text:
-            raise ValueError("Empty response from OpenAI API")
-
-        # Clean up response (remove markdown if present)
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        # Parse JSON
-        try:
-            extracted_data = json.loads(response_text)
-            return extracted_data
-        except json.JSONDecodeError as e:
-            raise ValueError(
-                f"Failed to parse OpenAI response as JSON: {str(e)}\nResponse was: {response_text[:500]}"
-            )
-
     except openai.APIError as e:
         raise ValueError(f"OpenAI API error: {str(e)}")
     except Exception as e:
         raise ValueError(f"Failed to extract data from image using GPT: {str(e)}")
 
 
+def extract_data_from_images_batch(files: list) -> list[dict]:
+    """
+    Extract structured invoice data from several single-page invoice images,
+    sending up to IMAGES_PER_REQUEST invoices in each GPT-4 Vision request.
+    The extraction instructions are sent once per request instead of once per
+    invoice, and each request counts once against the requests-per-minute limit.
+
+    Args:
+        files: File-like objects containing image data, one invoice each
+
+    Returns:
+        list: Extracted structured data with header and line_items for each file,
+              in the order given
+
+    Raises:
+        ValueError: If API call fails or the response does not hold one result per image
+    """
+    try:
+        encoded_images = [encode_image_file(file) for file in files]
+        groups = [
+            encoded_images[start : start + IMAGES_PER_REQUEST]
+            for start in range(0, len(encoded_images), IMAGES_PER_REQUEST)
+        ]
+        if not groups:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers=min(VISION_MAX_WORKERS, len(groups))
+        ) as executor:
+            results = executor.map(_extract_image_group, groups)
+            return [data for group_data in results for data in group_data]
+
+    except openai.APIError as e:
+        raise ValueError(f"OpenAI API error: {str(e)}")
+    except Exception as e:
+        raise ValueError(f"Failed to extract data from images using GPT: {str(e)}")
+
+
+def _extract_image_group(encoded_images: list[tuple[str, str]]) -> list[dict]:
+    """
+    Extract several invoice images in a single GPT-4 Vision request.
+
+    Args:
+        encoded_images: Base64-encoded image string and MIME type of each invoice
+
+    Returns:
+        list: Extracted structured data of each invoice, in the order given
+
+    Raises:
+        ValueError: If the response does not hold one result per image
+    """
+    content = [
+        {
+            "type": "text",
+            "text": EXTRACTION_PROMPT
+            + f"\n\nNote: This request contains {len(encoded_images)} separate invoice "
+            'images. Return a JSON object {"invoices": [...]} holding one object with '
+            "the structure above for each invoice, in the order the images are given.",
+        }
+    ]
+    for number, (base64_image, mime_type) in enumerate(encoded_images, start=1):
+        content.append({"type": "text", "text": f"Invoice {number}:"})
+        content.append(
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:{mime_type};base64,{base64_image}"},
+            }
+        )
+
+    data = _call_and_parse(_build_request(content), "extract_data_from_images_batch")
+    invoices = data.get("invoices")
+    if not isinstance(invoices, list) or len(invoices) != len(encoded_images):
+        raise ValueError(
+            f"Expected {len(encoded_images)} invoices in the response, got "
+            f"{len(invoices) if isinstance(invoices, list) else 'none'}"
+        )
+    return invoices
+
+
+def extract_data_from_page_image_gpt(
+    base64_image: str, page_number: int = 1, page_count: int = 1
+) -> dict:
+    """
+    Extract structured invoice data from a single rendered PDF page using
+    OpenAI GPT-4 Vision API.
+
+    Args:
+        base64_image: Base64-encoded JPEG of the page
+        page_number: 1-based page number, used in the prompt of multi-page documents
+        page_count: Number of pages in the document
+
+    Returns:
+        dict: Extracted structured data with header and line_items
+
+    Raises:
+        ValueError: If the response is empty or not valid JSON
+    """
+    return _call_and_parse(
+        build_image_request(base64_image, page_number, page_count),
+        f"extract_data_from_pdf_gpt - page {page_number}/{page_count}",
+    )
+
+
+def merge_page_extractions(page_data: list[dict]) -> dict:
+    """
+    Merge the extraction results of the pages of one document.
+    Line items are concatenated in page order; for header fields and the
+    customer name the first page with a value wins.
+
+    Args:
+        page_data: Extracted data of each page, in page order
+
+    Returns:
+        dict: Merged data with header, line_items and extracted_customer_name
+    """
+    merged = {"header": {}, "line_items": [], "extracted_customer_name": None}
+    for data in page_data:
+        for field, value in (data.get("header") or {}).items():
+            if merged["header"].get(field) is None:
+                merged["header"][field] = value
+        merged["line_items"].extend(data.get("line_items") or [])
+        if merged["extracted_customer_name"] is None:
+            merged["extracted_customer_name"] = data.get("extracted_customer_name")
+    return merged
+
+
+def render_pdf_pages(file) -> Iterator[str]:
+    """
+    Render every page of a PDF to a base64-encoded JPEG, one page at a time.
+    Uses PyMuPDF when installed: it renders in-process from the PDF data,
+    without spawning poppler's pdftoppm or decoding pages through PIL.
+    Falls back to pdf2image otherwise.
+
+    Args:
+        file: File-like object containing PDF data
+
+    Returns:
+        Iterator: Base64-encoded JPEG of each page, in page order; each page is
+            rendered only when the iterator reaches it
+
+    Raises:
+        ImportError: If neither PyMuPDF nor pdf2image is installed
+    """
+    # Resolve the renderer now so a missing one is reported before iteration
+    try:
+        import pymupdf  # noqa: F401
+    except ImportError:
+        import pdf2image  # noqa: F401
+
+        return _render_pdf_pages_pdf2image(file)
+    return _render_pdf_pages_pymupdf(file)
+
+
+def _render_pdf_pages_pymupdf(file) -> Iterator[str]:
+    """
+    Render PDF pages with PyMuPDF, one page per iteration step.
+
+    Args:
+        file: File-like object containing PDF data
+
+    Yields:
+        str: Base64-encoded JPEG of each page, in page order
+    """
+    import pymupdf
+
+    # PyMuPDF reads an in-memory BytesIO buffer without copying it
+    file.seek(0)
+    stream = file if isinstance(file, BytesIO) else file.read()
+    with pymupdf.open(stream=stream, filetype="pdf") as document:
+        for page in document:
+            # Oversized pages (e.g. A3, plans) are rendered at a lower resolution
+            # so their longest edge stays within MAX_IMAGE_DIMENSION
+            longest_side = max(page.rect.width, page.rect.height) / 72
+            dpi = min(PDF_RENDER_DPI, int(MAX_IMAGE_DIMENSION / longest_side))
+            jpeg = page.get_pixmap(dpi=dpi).tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+            yield base64.b64encode(jpeg).decode()
+
+
+def _render_pdf_pages_pdf2image(file) -> Iterator[str]:
+    """
+    Render PDF pages with pdf2image.
+
+    Args:
+        file: File-like object containing PDF data
+
+    Yields:
+        str: Base64-encoded JPEG of each page, in page order
+    """
+    from pdf2image import convert_from_bytes
+
+    file.seek(0)
+    # Pages are split across several pdftoppm processes and written to a
+    # temporary directory; each file is only decoded when its page is encoded
+    with tempfile.TemporaryDirectory() as output_folder:
+        images = convert_from_bytes(
+            file.read(),
+            dpi=PDF_RENDER_DPI,
+            fmt="jpeg",
+            thread_count=PDF_RENDER_THREADS,
+            output_folder=output_folder,
+        )
+        for image in images:
+            yield image_to_base64(image)
+            image.close()
+
+
+def load_pdf_for_extraction(file) -> str | tuple[int, Iterator[str]]:
+    """
+    Read a PDF for data extraction.
+    Text-based PDFs yield their text; image-based/scanned PDFs are rendered to images.
+
+    Args:
+        file: File-like object containing PDF data
+
+    Returns:
+        str | tuple: Text of a text-based PDF, or the page count of a scanned one
+            and an iterator rendering its pages to base64-encoded JPEGs
+
+    Raises:
+        ValueError: If the PDF is image-based and no PDF renderer is installed
+    """
+    from pypdf import PdfReader
+
+    pdf_reader = PdfReader(file)
+
+    # First, try to extract text directly from PDF (for text-based PDFs)
+    # The stripped length is totalled while reading, in the same pass
+    all_text = []
+    total_text_length = 0
+    for page in pdf_reader.pages:
+        page_text = page.extract_text()
+        stripped_length = len(page_text.strip()) if page_text else 0
+        if stripped_length:
+            all_text.append(page_text)
+            total_text_length += stripped_length
+
+    # Check if we got substantial text extraction (likely text-based PDF)
+    if total_text_length > 100:
+        return "\n".join(all_text)
+
+    # If text extraction was poor (likely scanned/image-based PDF),
+    # convert pages to images for GPT Vision
+    try:
+        return len(pdf_reader.pages), render_pdf_pages(file)
+    except ImportError:
+        # If no PDF renderer is installed, fall back to text extraction
+        if all_text:
+            return "\n".join(all_text)
+        raise ValueError(
+            "PDF appears to be image-based. Install PyMuPDF for better extraction: "
+            "pip install pymupdf. Alternatively install pdf2image and poppler-utils: "
+            "sudo apt-get install poppler-utils (Linux) or "
+            "brew install poppler (macOS)"
+        )
+
+
 def extract_data_from_pdf_gpt(file) -> dict:
     """
     Extract structured invoice data from a PDF file using OpenAI GPT API.
@@ -207,172 +688,39 @@ def extract_data_from_pdf_gpt(file) -> dict:
         ValueError: If API call fails or PDF processing fails
     """
     try:
-        pdf_reader = PdfReader(file)
-
-        # First, try to extract text directly from PDF (for text-based PDFs)
-        all_text = []
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text and page_text.strip():
-                all_text.append(page_text)
-
-        # Check if we got substantial text extraction (likely text-based PDF)
-        total_text_length = sum(len(text.strip()) for text in all_text)
-        if total_text_length > 100:
+        content = load_pdf_for_extraction(file)
+        if isinstance(content, str):
             # Use text-based extraction
-            text_content = "\n".join(all_text)
-            return extract_data_from_text_gpt(text_content)
-
-        # If text extraction was poor (likely scanned/image-based PDF),
-        # convert pages to images and use GPT Vision
-        try:
-            from pdf2image import convert_from_bytes
-
-            # Read PDF bytes
-            file.seek(0)
-            pdf_bytes = file.read()
-
-            # Convert PDF pages to images
-            images = convert_from_bytes(pdf_bytes, dpi=200)
-
-            # Process first page (or all pages if multi-page)
-            # For invoices, usually the first page has all the data
-            if len(images) == 1:
-                # Single page - process it
-                base64_image = image_to_base64(images[0])
-                prompt = create_extraction_prompt()
-
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a data extraction expert. Extract structured data from invoices and return only valid JSON.",
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt,
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{base64_image}",
-                                    },
-                                },
-                            ],
-                        },
-                    ],
-                    response_format={"type": "json_object"},
-                    max_tokens=4096,
-                    temperature=0.1,
-                )
-
-                # Print token usage
-                if response.usage:
-                    usage = response.usage
-                    print(
-                        f"[extract_data_from_pdf_gpt - single page] Token usage - Prompt: {usage.prompt_tokens}, Completion: {usage.completion_tokens}, Total: {usage.total_tokens}"
-                    )
-
-                response_text = response.choices[0].message.content
-                if not response_text:
-                    raise ValueError("Empty response from OpenAI API")
-
-                # Clean up and parse JSON
-                response_text = response_text.strip()
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-
-                try:
-                    extracted_data = json.loads(response_text)
-                    return extracted_data
-                except json.JSONDecodeError as e:
-                    raise ValueError(
-                        f"Failed to parse OpenAI response as JSON: {str(e)}\nResponse was: {response_text[:500]}"
-                    )
-            else:
-                # Multi-page PDF - process first page (assumes invoice fits on first page)
-                # Could be extended to process all pages and merge results
-                base64_image = image_to_base64(images[0])
-                prompt = create_extraction_prompt()
-
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a data extraction expert. Extract structured data from invoices and return only valid JSON.",
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                    + "\n\nNote: This is page 1 of a multi-page document. Extract all data visible on this page.",
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{base64_image}",
-                                    },
-                                },
-                            ],
-                        },
-                    ],
-                    response_format={"type": "json_object"},
-                    max_tokens=4096,
-                    temperature=0.1,
-                )
-
-                # Print token usage
-                if response.usage:
-                    usage = response.usage
-                    print(
-                        f"[extract_data_from_pdf_gpt - multi-page] Token usage - Prompt: {usage.prompt_tokens}, Completion: {usage.completion_tokens}, Total: {usage.total_tokens}"
-                    )
-
-                response_text = response.choices[0].message.content
-                if not response_text:
-                    raise ValueError("Empty response from OpenAI API")
-
-                response_text = response_text.strip()
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-
-                try:
-                    extracted_data = json.loads(response_text)
-                    return extracted_data
-                except json.JSONDecodeError as e:
-                    raise ValueError(
-                        f"Failed to parse OpenAI response as JSON: {str(e)}\nResponse was: {response_text[:500]}"
-                    )
-
-        except ImportError:
-            # If pdf2image is not installed, fall back to text extraction
-            if all_text:
-                text_content = "\n".join(all_text)
-                return extract_data_from_text_gpt(text_content)
-            else:
-                raise ValueError(
-                    "PDF appears to be image-based. Install pdf2image for better extraction: "
-                    "pip install pdf2image. Also install poppler-utils: "
-                    "sudo apt-get install poppler-utils (Linux) or "
-                    "brew install poppler (macOS)"
+            return extract_data_from_text_gpt(content)
+
+        page_count, pages = content
+        if page_count == 1:
+            return extract_data_from_page_image_gpt(next(pages))
+
+        # Multi-page PDF - send the pages to GPT Vision in parallel and merge
+        # the results; total latency is bounded by the slowest pages instead
+        # of the sum of all pages. At most max_workers pages are in flight: the
+        # next page is only rendered once one finishes, so rendering overlaps
+        # with the requests while only a bounded window of pages is in memory
+        max_workers = min(VISION_MAX_WORKERS, page_count)
+        page_data: list[dict | None] = [None] * page_count
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+            for page_number, base64_image in enumerate(pages, start=1):
+                if len(in_flight) >= max_workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        page_data[in_flight.pop(future)] = future.result()
+                future = executor.submit(
+                    extract_data_from_page_image_gpt,
+                    base64_image,
+                    page_number,
+                    page_count,
                 )
+                in_flight[future] = page_number - 1
+            for future, index in in_flight.items():
+                page_data[index] = future.result()
+        return merge_page_extractions(page_data)
 
     except Exception as e:
         raise ValueError(f"Failed to extract data from PDF using GPT: {str(e)}")
@@ -389,52 +737,120 @@ def extract_data_from_text_gpt(text_content: str) -> dict:
     Returns:
         dict: Extracted structured data with header and line_items
     """
-    prompt = create_extraction_prompt() + "\n\nDocument text:\n" + text_content
-
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a data extraction expert. Extract structured data from invoices and return only valid JSON.",
-            },
-            {
-                "role": "user",
-                "content": prompt,
-            },
-        ],
-        response_format={"type": "json_object"},
-        max_tokens=4096,
-        temperature=0.1,
+    return _call_and_parse(
+        build_text_request(text_content), "extract_data_from_text_gpt"
     )
 
-    # Print token usage
-    if response.usage:
-        usage = response.usage
-        print(
-            f"[extract_data_from_text_gpt] Token usage - Prompt: {usage.prompt_tokens}, Completion: {usage.completion_tokens}, Total: {usage.total_tokens}"
-        )
 
-    response_text = response.choices[0].message.content
-    if not response_text:
-        raise ValueError("Empty response from OpenAI API")
+def document_requests(file, filename: str) -> list[dict]:
+    """
+    Build the chat completion arguments needed to extract one document.
+    Scanned multi-page PDFs need one request per page; other documents need one.
 
-    response_text = response_text.strip()
-    if response_text.startswith("```json"):
-        response_text = response_text[7:]
-    if response_text.startswith("```"):
-        response_text = response_text[3:]
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    response_text = response_text.strip()
+    Args:
+        file: File-like object containing the document
+        filename: Original filename with extension
 
-    try:
-        extracted_data = json.loads(response_text)
-        return extracted_data
-    except json.JSONDecodeError as e:
-        raise ValueError(
-            f"Failed to parse OpenAI response as JSON: {str(e)}\nResponse was: {response_text[:500]}"
-        )
+    Returns:
+        list: Keyword arguments for client.chat.completions.create, in page order
+
+    Raises:
+        ValueError: If file type is not supported
+    """
+    file_ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+    if file_ext == "pdf":
+        content = load_pdf_for_extraction(file)
+        if isinstance(content, str):
+            return [build_text_request(content)]
+        page_count, pages = content
+        return [
+            build_image_request(base64_image, page_number, page_count)
+            for page_number, base64_image in enumerate(pages, start=1)
+        ]
+    elif file_ext in {"png", "jpg", "jpeg"}:
+        file.seek(0)
+        base64_image, mime_type = encode_image_file(file)
+        return [build_image_request(base64_image, mime_type=mime_type)]
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+def submit_batch_extraction(paths: list[str]) -> str:
+    """
+    Submit documents for extraction through the OpenAI Batch API.
+    Batch requests cost half as much as synchronous ones and use a separate
+    rate limit pool, at the price of up to 24 hours turnaround; use it for
+    non-interactive work such as bulk reprocessing.
+
+    Args:
+        paths: Paths of the documents (images or PDFs) to extract
+
+    Returns:
+        str: Batch ID, to be passed to get_batch_extraction
+
+    Raises:
+        ValueError: If a file type is not supported or a PDF cannot be read
+    """
+    requests = []
+    for index, path in enumerate(paths):
+        with open(path, "rb") as file:
+            bodies = document_requests(file, os.path.basename(path))
+        for page_number, body in enumerate(bodies, start=1):
+            # Identifies the document and page the response belongs to
+            requests.append((f"{index}:{page_number}:{len(bodies)}", body))
+
+    return submit_batch(client, requests, metadata={"document_count": str(len(paths))})
+
+
+def get_batch_extraction(
+    batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL
+) -> list[dict | None]:
+    """
+    Wait for a batch submitted with submit_batch_extraction and parse its results.
+
+    Args:
+        batch_id: ID returned by submit_batch_extraction
+        poll_interval: Seconds between status checks
+
+    Returns:
+        list: Extracted data with header and line_items for each submitted document,
+              in submission order; None for documents whose requests failed
+
+    Raises:
+        ValueError: If the batch failed, expired or was cancelled
+    """
+    batch = wait_for_batch(client, batch_id, poll_interval)
+
+    # Collect the parsed pages and page count of each document
+    pages: dict[int, dict[int, dict | None]] = {}
+    page_counts: dict[int, int] = {}
+    for custom_id, content in batch_results(client, batch):
+        index, page_number, page_count = map(int, custom_id.split(":"))
+        page_counts[index] = page_count
+        data = None
+        if content is not None:
+            try:
+                data = _parse_json_response(content)
+            except ValueError:
+                pass
+        pages.setdefault(index, {})[page_number] = data
+
+    # Failed requests are only listed in the error file, so documents missing
+    # any page are reported as failed
+    document_count = int(batch.metadata["document_count"])
+    results = []
+    for index in range(document_count):
+        document_pages = pages.get(index, {})
+        page_count = page_counts.get(index, 0)
+        page_data = [document_pages.get(n) for n in range(1, page_count + 1)]
+        if not page_data or any(data is None for data in page_data):
+            results.append(None)
+        elif len(page_data) == 1:
+            results.append(page_data[0])
+        else:
+            results.append(merge_page_extractions(page_data))
+    return results
 
 
 def match_customer_to_database(
@@ -451,52 +867,26 @@ def match_customer_to_database(
         tuple: (Customer, IndividualCustomer) or (Customer, StoreCustomer) if found,
                or (None, None) if not found
     """
-    if not customer_name:
+    match = match_customer(customer_name, session)
+    if match is None:
         return None, None
 
-    customer_name = customer_name.strip()
-
-    # Try to match individual customer (FirstName + LastName)
-    name_parts = customer_name.split()
-    if len(name_parts) >= 2:
-        first_name = name_parts[0]
-        last_name = " ".join(name_parts[1:])
-
-        individual = (
-            session.query(IndividualCustomer)
-            .filter(
-                IndividualCustomer.FirstName.ilike(f"%{first_name}%"),
-                IndividualCustomer.LastName.ilike(f"%{last_name}%"),
-            )
-            .first()
-        )
-
-        if individual:
-            customer = (
-                session.query(Customer)
-                .filter(Customer.PersonID == individual.BusinessEntityID)
-                .first()
-            )
-            if customer:
-                return customer, individual
-
-    # Try to match store customer (Name)
-    store = (
-        session.query(StoreCustomer)
-        .filter(StoreCustomer.Name.ilike(f"%{customer_name}%"))
-        .first()
-    )
-
-    if store:
-        customer = (
-            session.query(Customer)
-            .filter(Customer.StoreID == store.BusinessEntityID)
-            .first()
+    # Load the matched customer and its detail row together in one joined query
+    if match.is_store:
+        detail_model = StoreCustomer
+        join_condition = Customer.StoreID == StoreCustomer.BusinessEntityID
+    else:
+        detail_model = IndividualCustomer
+        join_condition = Customer.PersonID == IndividualCustomer.BusinessEntityID
+    customer, detail = session.execute(
+        select(Customer, detail_model)
+        .join(detail_model, join_condition)
+        .where(
+            Customer.CustomerID == match.CustomerID,
+            detail_model.id == match.detail_id,
         )
-        if customer:
-            return customer, store
-
-    return None, None
+    ).one()
+    return customer, detail
 
 
 def match_product_to_database(
@@ -541,7 +931,7 @@ def match_product_to_database(
     return None
 
 
-def extract_invoice_data_from_document(file, filename: str) -> dict:
+def extract_invoice_data_from_document(file, filename: str, session=None) -> dict:
     """
     Extract structured invoice data directly from a document (image or PDF) using OpenAI GPT API.
     This is a one-step process that combines text extraction and data extraction.
@@ -549,6 +939,8 @@ def extract_invoice_data_from_document(file, filename: str) -> dict:
     Args:
         file: File-like object containing the document
         filename: Original filename with extension
+        session: Database session used for customer and product matching; a new
+            session is opened for this document if omitted
 
     Returns:
         dict: Extracted data with header and line_items, including matched CustomerID and TerritoryID
@@ -557,23 +949,30 @@ def extract_invoice_data_from_document(file, filename: str) -> dict:
         ValueError: If file type is not supported or processing fails
     """
     file_ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-
-    # Extract structured data based on file type
-    if file_ext == "pdf":
-        extracted_data = extract_data_from_pdf_gpt(file)
-    elif file_ext in {"png", "jpg", "jpeg"}:
-        file.seek(0)
-        extracted_data = extract_data_from_image_gpt(file)
-    else:
+    if file_ext not in {"pdf", "png", "jpg", "jpeg"}:
         raise ValueError(f"Unsupported file type: {file_ext}")
 
-    print("extracted_data", extracted_data)
-
-    # Match customer if customer name was extracted
-    if "extracted_customer_name" in extracted_data:
-        customer_name = extracted_data.get("extracted_customer_name")
-        if customer_name:
-            with get_db_session() as session:
+    # Re-uploads of the same document reuse the cached model output; customer
+    # and product matching below always runs against the current database
+    file.seek(0)
+    data = file.read()
+    cache_key = extraction_cache_key(f"openai-full-v{EXTRACTION_PROMPT_VERSION}", data)
+    extracted_data = get_cached_extraction(cache_key)
+    if extracted_data is None:
+        # Extract structured data based on file type
+        if file_ext == "pdf":
+            extracted_data = extract_data_from_pdf_gpt(BytesIO(data))
+        else:
+            extracted_data = extract_data_from_image_gpt(BytesIO(data))
+        set_cached_extraction(cache_key, extracted_data)
+
+    # Customer and product matching share one session; batch callers can pass their
+    # own so it is not opened and closed for every document
+    with nullcontext(session) if session is not None else get_db_session() as session:
+        # Match customer if customer name was extracted
+        if "extracted_customer_name" in extracted_data:
+            customer_name = extracted_data.get("extracted_customer_name")
+            if customer_name:
                 customer, customer_detail = match_customer_to_database(
                     customer_name, session
                 )
@@ -618,9 +1017,8 @@ def extract_invoice_data_from_document(file, filename: str) -> dict:
                 else:
                     extracted_data["customer_detail"] = None
 
-    # Match products for each line item
-    if "line_items" in extracted_data and extracted_data["line_items"]:
-        with get_db_session() as session:
+        # Match products for each line item
+        if "line_items" in extracted_data and extracted_data["line_items"]:
             for line_item in extracted_data["line_items"]:
                 product_id = line_item.get("ProductID")
                 product_description = line_item.get("ProductDescription")
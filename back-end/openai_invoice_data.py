@@ -3,13 +3,32 @@ OpenAI GPT API-based invoice data extraction module.
 Extracts structured data (SalesOrderHeader and SalesOrderDetail) from document text.
 """
 
-import json
+import hashlib
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from functools import lru_cache
 
 import openai
+import orjson
+import pydantic
+from customer_matching import match_customer_to_database
 from db import get_db_session
 from dotenv import load_dotenv
-from models import Customer, IndividualCustomer, StoreCustomer
+from extraction_cache import (
+    extraction_cache_key,
+    get_cached_extraction,
+    set_cached_extraction,
+)
+from openai_batch import (
+    BATCH_POLL_INTERVAL,
+    batch_results,
+    submit_batch,
+    wait_for_batch,
+)
+from schemas import ExtractedInvoice, ExtractedInvoiceGroup
 
 # Load environment variables
 load_dotenv()
@@ -22,22 +41,102 @@ if not OPENAI_API_KEY:
         "Set it in .env file or environment."
     )
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
-
-
-def create_extraction_prompt(text_content: str) -> str:
-    """
-    Create a prompt for OpenAI GPT to extract invoice data.
-
-    Args:
-        text_content: Extracted text from the document
-
-    Returns:
-        str: Formatted prompt for GPT
-    """
-    prompt = """You are an expert at extracting structured data from invoices and sales documents.
-
-Extract all relevant information from the following document text and return it as a JSON object matching the structure below.
+# Transient API errors (429, 5xx, connection errors) are retried by the client with
+# jittered exponential backoff, honoring the Retry-After header
+# The short connect timeout lets an unreachable endpoint fail over to a retry quickly
+# instead of waiting out the full read timeout; the client keeps one keep-alive
+# connection pool for all threads
+client = openai.OpenAI(
+    api_key=OPENAI_API_KEY,
+    max_retries=5,
+    timeout=openai.Timeout(120.0, connect=5.0),
+)
+
+# Model used for extraction; gpt-4o-mini is far cheaper and faster than gpt-4o,
+# and structured outputs keep its responses to the expected shape
+# Can be overridden via environment variable OPENAI_EXTRACTION_MODEL
+EXTRACTION_MODEL = os.getenv("OPENAI_EXTRACTION_MODEL", "gpt-4o-mini")
+
+# Maximum number of documents sent in one request by extract_invoice_data_from_texts
+# More documents per request amortize the system prompt further but make a failed
+# response more expensive to retry
+TEXTS_PER_REQUEST = 5
+
+# Longest document text, in characters, that is grouped with others in one request;
+# longer documents are extracted in a request of their own
+GROUPED_TEXT_MAX_CHARS = 8000
+
+# Output token limit of a single-document request and of any request
+MAX_OUTPUT_TOKENS = 4096
+MAX_GROUP_OUTPUT_TOKENS = 16384
+
+# Sampling seed sent with every request, so repeated extractions of the same text
+# return the same result as far as the API allows
+EXTRACTION_SEED = 42
+
+# "Bill to:", "Sold to:" or "Customer:" label, with the name on the same or the next line
+_CUSTOMER_LABEL_RE = re.compile(
+    r"^[ \t]*(?:bill(?:ed)?[ \t]+to|sold[ \t]+to|customer(?:[ \t]+name)?)[ \t]*:[ \t]*(.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Labelled invoice number, order date and total at the start of a line, matched in a
+# single pass; the value may follow on the same or the next line. Anchoring the label
+# keeps qualified labels such as "Tax Total" or "Due Date" from matching
+_HEADER_FIELD_RE = re.compile(
+    r"^[ \t]*(?:(?P<number>(?:invoice|order)\s*(?:#|no\b\.?|number\b))"
+    r"|(?P<total>(?:total(?:\s+due)?|amount\s+due)\b)"
+    r"|(?P<date>(?:(?:invoice|order)\s+)?date\b))"
+    r"[ \t]*[:#]?\s*(?P<value>[^\n]+)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Labels of fields and line-item columns the regex pre-pass does not read; a document
+# holding any of them needs the LLM
+_UNREAD_FIELD_RE = re.compile(
+    r"\b(?:p\.?\s?o\b\.?|purchase\s+order|account|ship(?:ping|ped)?|due\s+date"
+    r"|tax|sub\s*-?total|freight|discount|qty|quantity|items?|unit\s+price)\b",
+    re.IGNORECASE,
+)
+
+# Date and amount at the start of a labelled value
+_DATE_RE = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})\b")
+_AMOUNT_RE = re.compile(r"\$?\s*(\d[\d,]*\.\d{2})\b")
+
+# Line holding a quantity, a unit price and a line total, i.e. a likely line item
+_LINE_ITEM_RE = re.compile(
+    r"\d+(?:\.\d+)?\s+\$?[\d,]+\.\d{2}\s+\$?[\d,]+\.\d{2}\s*$", re.MULTILINE
+)
+
+# JSON body of a response wrapped in optional markdown code fences
+_FENCE_RE = re.compile(r"^\s*(?:```(?:json)?\s*)?(.*?)(?:\s*```)?\s*$", re.DOTALL)
+
+# Completed extracted_customer_name value in a partially streamed response
+_STREAMED_NAME_RE = re.compile(
+    r'"extracted_customer_name"\s*:\s*("(?:[^"\\]|\\.)*"|null)'
+)
+
+# Number of leading response characters searched for the streamed customer name
+STREAMED_NAME_SEARCH_CHARS = 1024
+
+# Maximum number of document text tokens sent per request; longer texts (e.g. large
+# OCR dumps) are cut at the end, which mostly holds terms and boilerplate
+# Can be overridden via environment variable MAX_INPUT_TOKENS
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", 16000))
+
+# Maximum number of documents sent to the API concurrently by extract_invoice_data_from_texts
+# Can be overridden via environment variable EXTRACTION_MAX_WORKERS
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", 8))
+
+
+# Role, field schema and output instructions, sent as the system message
+# The static instructions come first and the document text last, so every request
+# shares the same prefix and is eligible for OpenAI's automatic prompt caching
+SYSTEM_PROMPT = """You are a data extraction expert. Extract structured data from invoices and return only valid JSON.
+
+You are an expert at extracting structured data from invoices and sales documents.
+
+Extract all relevant information from the document text provided by the user and return it as a JSON object matching the structure below.
 
 The JSON should have two main sections:
 1. "header" - containing all SalesOrderHeader fields
@@ -78,70 +177,272 @@ SalesOrderDetail fields to extract for each line item:
 - LineTotal (number, optional)
 - CarrierTrackingNumber (string, optional)
 
-Return ONLY valid JSON, no additional text or markdown formatting.
+Return ONLY valid JSON, no additional text or markdown formatting."""
 
-Document text:
-"""
-    return prompt + text_content
 
+def _strict_json_schema(schema):
+    """
+    Convert a pydantic JSON schema into the strict form required by structured
+    outputs: every object lists all its properties as required and allows no
+    others, and defaults are dropped.
+
+    Args:
+        schema: JSON schema, or a part of one
 
-def call_openai_api(text_content: str) -> dict:
+    Returns:
+        Strict copy of the schema
     """
-    Call OpenAI GPT API to extract structured data from text.
+    if isinstance(schema, list):
+        return [_strict_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    strict = {
+        key: _strict_json_schema(value)
+        for key, value in schema.items()
+        if key != "default"
+    }
+    if "properties" in schema:
+        strict["properties"] = {
+            name: _strict_json_schema(value)
+            for name, value in schema["properties"].items()
+        }
+        strict["additionalProperties"] = False
+        strict["required"] = list(schema["properties"])
+    return strict
+
+
+def response_format_for(model: type[pydantic.BaseModel]) -> dict:
+    """
+    Build the structured outputs response_format for a pydantic model, for requests
+    that cannot pass the model class itself (streamed and Batch API requests).
 
     Args:
-        text_content: Extracted text from document
+        model: Pydantic model the response must match
 
     Returns:
-        dict: Parsed JSON response from LLM
+        dict: response_format argument for chat completions
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "strict": True,
+            "schema": _strict_json_schema(model.model_json_schema()),
+        },
+    }
+
+
+# Strict JSON schema of ExtractedInvoice for structured outputs, so every response
+# is valid JSON with exactly the expected fields
+EXTRACTION_RESPONSE_FORMAT = response_format_for(ExtractedInvoice)
+
+# Hash of the system prompt, model, response schema and seed, part of the cache key,
+# so results cached before any of them changed are not reused
+EXTRACTION_FINGERPRINT = hashlib.sha256(
+    orjson.dumps(
+        [SYSTEM_PROMPT, EXTRACTION_MODEL, EXTRACTION_RESPONSE_FORMAT, EXTRACTION_SEED]
+    )
+).hexdigest()[:16]
 
-    Raises:
-        ValueError: If API call fails or response is invalid
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    """
+    Load the GPT-4o tokenizer once per process.
+
+    Returns:
+        Encoding: tiktoken encoding, or None if tiktoken is not installed
     """
     try:
-        prompt = create_extraction_prompt(text_content)
-
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Using GPT-4o for best results
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a data extraction expert. Extract structured data from invoices and return only valid JSON.",
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            response_format={"type": "json_object"},  # Force JSON response
-            max_tokens=4096,
-            temperature=0.1,  # Low temperature for more consistent extraction
-        )
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.encoding_for_model("gpt-4o")
 
-        # Extract text from response
-        response_text = response.choices[0].message.content
 
-        if not response_text:
-            raise ValueError("Empty response from OpenAI API")
+def truncate_to_token_budget(
+    text_content: str, max_tokens: int = MAX_INPUT_TOKENS
+) -> str:
+    """
+    Cut document text down to a token budget, keeping its beginning, where the
+    invoice number, dates, parties and line items usually appear.
+
+    Args:
+        text_content: Extracted text from document
+        max_tokens: Maximum number of tokens to keep
+
+    Returns:
+        str: The text, truncated if it exceeds the budget
+    """
+    # Every token covers at least one character, so short texts cannot exceed it
+    if len(text_content) <= max_tokens:
+        return text_content
+
+    encoding = _token_encoding()
+    if encoding is None:
+        # Without tiktoken, approximate the budget at ~4 characters per token
+        return text_content[: max_tokens * 4]
+
+    tokens = encoding.encode(text_content)
+    if len(tokens) <= max_tokens:
+        return text_content
+    return encoding.decode(tokens[:max_tokens])
+
+
+def create_extraction_prompt(text_content: str) -> str:
+    """
+    Create the user message for OpenAI GPT to extract invoice data.
+
+    Args:
+        text_content: Extracted text from the document
+
+    Returns:
+        str: Formatted prompt for GPT
+    """
+    return "Document text:\n" + text_content
+
+
+def build_extraction_request(text_content: str) -> dict:
+    """
+    Build the chat completion arguments for extracting data from document text.
+
+    Args:
+        text_content: Extracted text from document
+
+    Returns:
+        dict: Keyword arguments for client.chat.completions.create
+    """
+    prompt = create_extraction_prompt(truncate_to_token_budget(text_content))
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT,
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            },
+        ],
+        "response_format": EXTRACTION_RESPONSE_FORMAT,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        # Greedy sampling with a fixed seed for repeatable extraction
+        "temperature": 0,
+        "seed": EXTRACTION_SEED,
+    }
+
+
+def build_group_extraction_request(texts: list[str]) -> dict:
+    """
+    Build the chat completion arguments for extracting several documents at once.
+
+    Args:
+        texts: Extracted text of each document
+
+    Returns:
+        dict: Keyword arguments for client.chat.completions.parse
+    """
+    documents = "\n".join(
+        f'<DOC id="{number}">\n{truncate_to_token_budget(text_content)}\n</DOC>'
+        for number, text_content in enumerate(texts, start=1)
+    )
+    prompt = (
+        f"This request contains {len(texts)} separate documents. Return a JSON object "
+        '{"invoices": [...]} holding one object with the structure above for each '
+        "document, in the order the documents are given.\n\nDocuments:\n" + documents
+    )
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT,
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            },
+        ],
+        "response_format": ExtractedInvoiceGroup,
+        "max_tokens": min(MAX_OUTPUT_TOKENS * len(texts), MAX_GROUP_OUTPUT_TOKENS),
+        "temperature": 0,
+        "seed": EXTRACTION_SEED,
+    }
+
+
+def parse_extraction_response(response_text: str | None) -> dict:
+    """
+    Parse and validate the JSON object returned by the model.
+
+    Args:
+        response_text: Message content of the model response
+
+    Returns:
+        dict: Parsed JSON response from LLM
 
-        # Try to extract JSON from response (may be wrapped in markdown even with json_object format)
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        # Parse JSON
+    Raises:
+        ValueError: If the response is empty or does not match the schema
+    """
+    if not response_text:
+        raise ValueError("Empty response from OpenAI API")
+
+    # Structured outputs guarantee schema-conforming JSON, so it is parsed and
+    # validated directly; the fenced JSON body is only extracted if that fails
+    try:
+        extracted = ExtractedInvoice.model_validate_json(response_text)
+    except pydantic.ValidationError as e:
+        match = _FENCE_RE.match(response_text)
         try:
-            extracted_data = json.loads(response_text)
-            return extracted_data
-        except json.JSONDecodeError as e:
+            extracted = ExtractedInvoice.model_validate_json(match.group(1))
+        except pydantic.ValidationError:
             raise ValueError(
                 f"Failed to parse OpenAI response as JSON: {str(e)}\nResponse was: {response_text[:500]}"
             )
+    return extracted.model_dump(mode="json")
+
+
+def call_openai_api(text_content: str, on_customer_name=None) -> dict:
+    """
+    Call OpenAI GPT API to extract structured data from text.
+    The response is streamed; extracted_customer_name is generated first, so it is
+    available long before the line items finish.
+
+    Args:
+        text_content: Extracted text from document
+        on_customer_name: Optional callback receiving the extracted customer name
+            as soon as it has been streamed, while the rest is still generated
+
+    Returns:
+        dict: Parsed JSON response from LLM
+
+    Raises:
+        ValueError: If API call fails or response is invalid
+    """
+    try:
+        stream = client.chat.completions.create(
+            **build_extraction_request(text_content), stream=True
+        )
+
+        # Accumulate the streamed content
+        parts = []
+        prefix = ""
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            parts.append(chunk.choices[0].delta.content)
+            # The name leads the response, so only its beginning is searched
+            if on_customer_name and len(prefix) < STREAMED_NAME_SEARCH_CHARS:
+                prefix = "".join(parts)
+                match = _STREAMED_NAME_RE.search(prefix)
+                if match:
+                    customer_name = orjson.loads(match.group(1))
+                    if customer_name:
+                        on_customer_name(customer_name)
+                    on_customer_name = None
+
+        return parse_extraction_response("".join(parts))
 
     except openai.APIError as e:
         raise ValueError(f"OpenAI API error: {str(e)}")
@@ -149,74 +450,256 @@ def call_openai_api(text_content: str) -> dict:
         raise ValueError(f"Error calling OpenAI API: {str(e)}")
 
 
-def match_customer_to_database(customer_name: str, session) -> tuple:
+def extract_invoice_data_batch(
+    texts: list[str], poll_interval: float = BATCH_POLL_INTERVAL
+) -> list[dict | None]:
     """
-    Match extracted customer name to CustomerID in database.
+    Extract structured data from many document texts through the OpenAI Batch API.
+    Batch requests cost half as much as synchronous ones and use a separate
+    rate limit pool, at the price of up to 24 hours turnaround; use it for
+    bulk processing rather than interactive uploads.
 
     Args:
-        customer_name: Customer name extracted from document
-        session: Database session
+        texts: Extracted text of each document
+        poll_interval: Seconds between batch status checks
 
     Returns:
-        tuple: (CustomerID, TerritoryID) or (None, None) if not found
+        list: Parsed JSON response for each text, in input order; None for texts
+              whose request failed
+
+    Raises:
+        ValueError: If the batch failed, expired or was cancelled
     """
+    batch_id = submit_batch(
+        client,
+        [
+            (str(index), build_extraction_request(text_content))
+            for index, text_content in enumerate(texts)
+        ],
+    )
+    batch = wait_for_batch(client, batch_id, poll_interval)
+
+    # Failed requests are only listed in the error file and stay None
+    results: list[dict | None] = [None] * len(texts)
+    for custom_id, content in batch_results(client, batch):
+        if content is None:
+            continue
+        try:
+            results[int(custom_id)] = parse_extraction_response(content)
+        except ValueError:
+            pass
+    return results
+
+
+def guess_customer_name(text_content: str) -> str | None:
+    """
+    Find the customer name in document text from its label, without calling the API.
+
+    Args:
+        text_content: Extracted text from document
+
+    Returns:
+        str: Name following the first customer label, or None if there is none
+    """
+    match = _CUSTOMER_LABEL_RE.search(text_content)
+    if not match:
+        return None
+    if match.group(1).strip():
+        return match.group(1).strip()
+    # The label stands alone; the name is on the next non-empty line
+    for line in text_content[match.end() :].splitlines():
+        if line.strip():
+            return line.strip()
+    return None
+
+
+def prextract_invoice_data(text_content: str) -> dict | None:
+    """
+    Read the header of a simple invoice with regular expressions, without calling
+    the API. Only documents whose invoice number, order date, total and customer
+    are all labelled in the text qualify; any line items, other labelled fields,
+    amounts outside the total label or further dates send the document to the LLM.
+
+    Args:
+        text_content: Extracted text from document
+
+    Returns:
+        dict: Extracted data with header and empty line_items, or None if the
+            document needs the LLM
+    """
+    if _LINE_ITEM_RE.search(text_content) or _UNREAD_FIELD_RE.search(text_content):
+        return None
+    if len(set(_DATE_RE.findall(text_content))) > 1:
+        return None
+    customer_name = guess_customer_name(text_content)
     if not customer_name:
-        return None, None
-
-    customer_name = customer_name.strip()
-
-    # Try to match individual customer (FirstName + LastName)
-    # Split name into parts
-    name_parts = customer_name.split()
-    if len(name_parts) >= 2:
-        first_name = name_parts[0]
-        last_name = " ".join(name_parts[1:])
-
-        individual = (
-            session.query(IndividualCustomer)
-            .filter(
-                IndividualCustomer.FirstName.ilike(f"%{first_name}%"),
-                IndividualCustomer.LastName.ilike(f"%{last_name}%"),
-            )
-            .first()
-        )
+        return None
+
+    header = {}
+    total_position = None
+    for match in _HEADER_FIELD_RE.finditer(text_content):
+        value = match.group("value").strip()
+        if match.group("number") and "SalesOrderNumber" not in header:
+            number = value.split()[0].strip("[]#:")
+            if any(char.isdigit() for char in number):
+                header["SalesOrderNumber"] = number
+        elif match.group("total") and "TotalDue" not in header:
+            amount = _AMOUNT_RE.match(value)
+            if amount:
+                header["TotalDue"] = float(amount.group(1).replace(",", ""))
+                total_position = match.start("value") + amount.start(1)
+        elif match.group("date") and "OrderDate" not in header:
+            date = _DATE_RE.match(value)
+            if date:
+                date_format = "%Y-%m-%d" if "-" in date.group(1) else "%m/%d/%Y"
+                try:
+                    header["OrderDate"] = datetime.strptime(date.group(1), date_format)
+                except ValueError:
+                    pass
+
+    if len(header) < 3:
+        return None
+    # Any amount outside the total label, even one equal to the total, belongs to
+    # a line item or field the pre-pass would drop
+    if any(
+        amount.start(1) != total_position
+        for amount in _AMOUNT_RE.finditer(text_content)
+    ):
+        return None
+    return ExtractedInvoice(
+        extracted_customer_name=customer_name, header=header
+    ).model_dump(mode="json")
+
+
+def _text_cache_key(text_content: str) -> str:
+    """
+    Build the extraction cache key of a document text.
 
-        if individual:
-            # Find corresponding Customer record
-            customer = (
-                session.query(Customer)
-                .filter(Customer.PersonID == individual.BusinessEntityID)
-                .first()
-            )
-            if customer:
-                return customer.CustomerID, customer.TerritoryID
-
-    # Try to match store customer (Name)
-    store = (
-        session.query(StoreCustomer)
-        .filter(StoreCustomer.Name.ilike(f"%{customer_name}%"))
-        .first()
+    Args:
+        text_content: Extracted text from document
+
+    Returns:
+        str: Cache key
+    """
+    return extraction_cache_key(
+        f"openai-text-{EXTRACTION_FINGERPRINT}", text_content.strip().encode()
     )
 
-    if store:
-        # Find corresponding Customer record
-        customer = (
-            session.query(Customer)
-            .filter(Customer.StoreID == store.BusinessEntityID)
-            .first()
+
+def extract_structured_data(text_content: str, on_customer_name=None) -> dict:
+    """
+    Extract structured data from document text, reusing the cached result when
+    the same text was extracted before.
+
+    Args:
+        text_content: Extracted text from document
+        on_customer_name: Optional callback receiving the customer name while the
+            response is still streamed; not called when no API call is made
+
+    Returns:
+        dict: Parsed JSON response from LLM
+
+    Raises:
+        ValueError: If API call fails or response is invalid
+    """
+    # Simple documents whose fields are all labelled skip the API call
+    extracted_data = prextract_invoice_data(text_content)
+    if extracted_data is not None:
+        return extracted_data
+
+    cache_key = _text_cache_key(text_content)
+    extracted_data = get_cached_extraction(cache_key)
+    if extracted_data is None:
+        extracted_data = call_openai_api(text_content, on_customer_name)
+        set_cached_extraction(cache_key, extracted_data)
+    return extracted_data
+
+
+def _extract_text_group(texts: list[str]) -> list[dict]:
+    """
+    Extract several document texts in a single request and cache each result.
+
+    Args:
+        texts: Extracted text of each document
+
+    Returns:
+        list: Parsed JSON response of each document, in the order given
+
+    Raises:
+        ValueError: If API call fails or the response does not hold one result per text
+    """
+    if len(texts) == 1:
+        return [extract_structured_data(texts[0])]
+
+    try:
+        response = client.chat.completions.parse(
+            **build_group_extraction_request(texts)
+        )
+        group = response.choices[0].message.parsed
+        if group is None:
+            raise ValueError("Empty response from OpenAI API")
+        invoices = group.invoices
+    except openai.OpenAIError as e:
+        raise ValueError(f"OpenAI API error: {str(e)}")
+    except pydantic.ValidationError as e:
+        raise ValueError(f"Failed to parse OpenAI response as JSON: {str(e)}")
+
+    if len(invoices) != len(texts):
+        raise ValueError(
+            f"Expected {len(texts)} invoices in the response, got {len(invoices)}"
         )
-        if customer:
-            return customer.CustomerID, customer.TerritoryID
 
-    return None, None
+    results = []
+    for text_content, invoice in zip(texts, invoices):
+        extracted_data = invoice.model_dump(mode="json")
+        set_cached_extraction(_text_cache_key(text_content), extracted_data)
+        results.append(extracted_data)
+    return results
+
+
+def _prefetch_customer_match(customer_name: str) -> None:
+    """
+    Match a customer name in its own session to fill the match cache.
+
+    Args:
+        customer_name: Customer name to match
+    """
+    with get_db_session() as session:
+        match_customer_to_database(customer_name, session)
+
+
+def apply_customer_match(extracted_data: dict, session) -> None:
+    """
+    Fill CustomerID and TerritoryID of the extracted header from the customer name
+    matched in the database.
+
+    Args:
+        extracted_data: Parsed extraction result, updated in place
+        session: Database session
+    """
+    # Match customer if customer name was extracted
+    if "extracted_customer_name" in extracted_data:
+        customer_name = extracted_data.get("extracted_customer_name")
+        if customer_name:
+            customer_id, territory_id = match_customer_to_database(
+                customer_name, session
+            )
+            # Update header with matched IDs
+            if "header" in extracted_data:
+                if customer_id:
+                    extracted_data["header"]["CustomerID"] = customer_id
+                if territory_id:
+                    extracted_data["header"]["TerritoryID"] = territory_id
 
 
-def extract_invoice_data_from_text(text_content: str) -> dict:
+def extract_invoice_data_from_text(text_content: str, session=None) -> dict:
     """
     Extract structured invoice data from document text using OpenAI GPT API.
 
     Args:
         text_content: Extracted text from document
+        session: Database session used for the final customer match; a new
+            session is opened for this document if omitted
 
     Returns:
         dict: Extracted data with header and line_items
@@ -227,27 +710,89 @@ def extract_invoice_data_from_text(text_content: str) -> dict:
     if not text_content or not text_content.strip():
         raise ValueError("No text content provided for extraction")
 
-    # Call OpenAI API to extract structured data
-    extracted_data = call_openai_api(text_content)
+    # Call OpenAI API to extract structured data; re-submissions of the same text
+    # reuse the cached model output, while customer matching below always runs
+    # against the current database
+    # While the API call runs, the customer names found by its label and streamed
+    # by the model are matched; the results land in the match cache, so the final
+    # match below is a cache hit. Prefetch results are never read, so a failed
+    # prefetch only costs that cache hit and cannot fail the extraction
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        future = executor.submit(
+            extract_structured_data,
+            text_content,
+            lambda name: executor.submit(_prefetch_customer_match, name),
+        )
 
-    # Match customer if customer name was extracted
-    if "extracted_customer_name" in extracted_data:
-        customer_name = extracted_data.get("extracted_customer_name")
-        if customer_name:
-            with get_db_session() as session:
-                customer_id, territory_id = match_customer_to_database(
-                    customer_name, session
-                )
-                # Update header with matched IDs
-                if "header" in extracted_data:
-                    if customer_id:
-                        extracted_data["header"]["CustomerID"] = customer_id
-                    if territory_id:
-                        extracted_data["header"]["TerritoryID"] = territory_id
+        guessed_name = guess_customer_name(text_content)
+        if guessed_name:
+            executor.submit(_prefetch_customer_match, guessed_name)
+
+        extracted_data = future.result()
+
+    # Callers extracting many documents in a loop can pass one session for all
+    with nullcontext(session) if session is not None else get_db_session() as session:
+        apply_customer_match(extracted_data, session)
 
     return extracted_data
 
 
+def extract_invoice_data_from_texts(
+    texts: list[str], max_workers: int = EXTRACTION_MAX_WORKERS
+) -> list[dict]:
+    """
+    Extract structured invoice data from several document texts using OpenAI GPT API.
+    Short documents are sent up to TEXTS_PER_REQUEST per request, so the system
+    prompt and the request overhead are shared; longer ones get a request each.
+    The requests run in parallel, so total latency is bounded by the slowest
+    one instead of the sum of all; customers are matched afterwards in a single
+    database session.
+
+    Args:
+        texts: Extracted text of each document
+        max_workers: Maximum number of concurrent API calls
+
+    Returns:
+        list: Extracted data with header and line_items for each text, in input order
+
+    Raises:
+        ValueError: If any text is empty or its extraction fails
+    """
+    if not texts:
+        return []
+    if any(not text_content or not text_content.strip() for text_content in texts):
+        raise ValueError("No text content provided for extraction")
+
+    # Simple documents are read locally and previously extracted texts are served
+    # from the cache
+    results = [
+        prextract_invoice_data(t) or get_cached_extraction(_text_cache_key(t))
+        for t in texts
+    ]
+    pending = [index for index, data in enumerate(results) if data is None]
+    short = [i for i in pending if len(texts[i]) <= GROUPED_TEXT_MAX_CHARS]
+    groups = [
+        short[start : start + TEXTS_PER_REQUEST]
+        for start in range(0, len(short), TEXTS_PER_REQUEST)
+    ] + [[i] for i in pending if len(texts[i]) > GROUPED_TEXT_MAX_CHARS]
+
+    if groups:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+            group_results = executor.map(
+                _extract_text_group,
+                [[texts[index] for index in group] for group in groups],
+            )
+            for group, group_data in zip(groups, group_results):
+                for index, extracted_data in zip(group, group_data):
+                    results[index] = extracted_data
+
+    with get_db_session() as session:
+        for extracted_data in results:
+            apply_customer_match(extracted_data, session)
+
+    return results
+
+
 if __name__ == "__main__":
     text = """
 [Company Name]
@@ -5,11 +5,12 @@ Uses GPT-4 Vision API to extract text from images and PDFs as an alternative to
 
 import base64
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
 import openai
 from dotenv import load_dotenv
-from PIL import Image
+from PIL import Image, ImageOps
 from pypdf import PdfReader
 
 # Load environment variables
@@ -23,21 +24,37 @@ if not OPENAI_API_KEY:
         "Set it in .env file or environment."
     )
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# Transient API errors are retried by the client with exponential backoff
+client = openai.OpenAI(api_key=OPENAI_API_KEY, max_retries=3, timeout=120.0)
 
+# Maximum number of PDF pages sent to the Vision API concurrently
+# Can be overridden via environment variable VISION_MAX_WORKERS
+VISION_MAX_WORKERS = int(os.getenv("VISION_MAX_WORKERS", 8))
 
-def image_to_base64(image: Image.Image) -> str:
+# Resolution for rendering scanned PDF pages; GPT-4o downsamples larger images
+PDF_RENDER_DPI = 150
+
+# JPEG quality for images sent to the Vision API
+JPEG_QUALITY = 85
+
+# Longest edge, in pixels, of images sent to the Vision API
+MAX_IMAGE_DIMENSION = 2048
+
+
+def image_to_base64(image: Image.Image, format: str = "JPEG") -> str:
     """
     Convert a PIL Image to base64-encoded string.
 
     Args:
         image: PIL Image object
+        format: Output image format; JPEG is several times smaller than PNG
 
     Returns:
         str: Base64-encoded image string
     """
     buffered = BytesIO()
     # Convert to RGB if necessary (for PNG with transparency)
+    # RGB and grayscale images are encoded as-is without a copy
     if image.mode in ("RGBA", "LA", "P"):
         rgb_image = Image.new("RGB", image.size, (255, 255, 255))
         if image.mode == "P":
@@ -46,7 +63,19 @@ def image_to_base64(image: Image.Image) -> str:
             image, mask=image.split()[-1] if image.mode in ("RGBA", "LA") else None
         )
         image = rgb_image
-    image.save(buffered, format="PNG")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    # Downscale oversized captures; GPT-4o resizes them to this bound anyway
+    if max(image.size) > MAX_IMAGE_DIMENSION:
+        image = ImageOps.contain(
+            image,
+            (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION),
+            Image.Resampling.LANCZOS,
+        )
+    if format == "JPEG":
+        image.save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    else:
+        image.save(buffered, format=format)
     img_str = base64.b64encode(buffered.getvalue()).decode()
     return img_str
 
@@ -83,7 +112,7 @@ def extract_text_from_image_gpt(file) -> str:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}",
+                                "url": f"data:image/jpeg;base64,{base64_image}",
                             },
                         },
                     ],
@@ -103,11 +132,73 @@ def extract_text_from_image_gpt(file) -> str:
         raise ValueError(f"Failed to extract text from image using GPT: {str(e)}")
 
 
+def extract_text_from_page_image_gpt(page_number: int, image: Image.Image) -> str:
+    """
+    Extract text from a single rendered PDF page using OpenAI GPT-4 Vision API.
+
+    Args:
+        page_number: 1-based page number, used in the prompt
+        image: PIL Image of the page
+
+    Returns:
+        str: Extracted text content of the page, empty for a blank page
+    """
+    base64_image = image_to_base64(image)
+
+    response = client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"Extract all text from page {page_number} of this PDF document. Preserve the structure, formatting, and layout as much as possible. Include all numbers, dates, addresses, and any other text content. Return only the extracted text without any additional commentary.",
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                        },
+                    },
+                ],
+            }
+        ],
+        max_tokens=4096,
+    )
+
+    return (response.choices[0].message.content or "").strip()
+
+
+def extract_text_from_scanned_page_gpt(pdf_bytes: bytes, page_number: int) -> str:
+    """
+    Render a single PDF page to an image and extract its text with GPT-4 Vision.
+
+    Args:
+        pdf_bytes: Raw PDF data
+        page_number: 1-based page number to render
+
+    Returns:
+        str: Extracted text content of the page
+    """
+    from pdf2image import convert_from_bytes
+
+    # Render only the requested page
+    images = convert_from_bytes(
+        pdf_bytes,
+        dpi=PDF_RENDER_DPI,
+        fmt="jpeg",
+        first_page=page_number,
+        last_page=page_number,
+    )
+    return extract_text_from_page_image_gpt(page_number, images[0])
+
+
 def extract_text_from_pdf_gpt(file) -> str:
     """
     Extract text from a PDF file using OpenAI GPT-4 Vision API.
-    For text-based PDFs, extracts text directly (faster and cheaper).
-    For image-based/scanned PDFs, converts pages to images and uses GPT-4 Vision.
+    Pages with a text layer are extracted directly (faster and cheaper).
+    Only pages without one, i.e. scanned pages, are rendered and sent to GPT-4 Vision.
 
     Args:
         file: File-like object containing PDF data
@@ -119,69 +210,28 @@ def extract_text_from_pdf_gpt(file) -> str:
         ValueError: If API call fails or PDF processing fails
     """
     try:
-        pdf_reader = PdfReader(file)
-
-        # First, try to extract text directly from PDF (for text-based PDFs)
-        # This is faster and cheaper than using Vision API
-        all_text = []
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text and page_text.strip():
-                all_text.append(page_text)
-
-        # Check if we got substantial text extraction (likely text-based PDF)
-        total_text_length = sum(len(text.strip()) for text in all_text)
-        if total_text_length > 100:  # Threshold for "good" text extraction
-            return "\n".join(all_text)
-
-        # If text extraction was poor (likely scanned/image-based PDF),
-        # convert pages to images and use GPT Vision
-        try:
-            from pdf2image import convert_from_bytes
-
-            # Read PDF bytes
-            file.seek(0)
-            pdf_bytes = file.read()
-
-            # Convert PDF pages to images
-            images = convert_from_bytes(pdf_bytes, dpi=200)
-
-            # Process each page with GPT Vision
-            text_parts = []
-            for i, image in enumerate(images):
-                base64_image = image_to_base64(image)
-
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": f"Extract all text from page {i+1} of this PDF document. Preserve the structure, formatting, and layout as much as possible. Include all numbers, dates, addresses, and any other text content. Return only the extracted text without any additional commentary.",
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{base64_image}",
-                                    },
-                                },
-                            ],
-                        }
-                    ],
-                    max_tokens=4096,
-                )
-
-                if not response.choices[0].message.content:
-                    raise ValueError("No text extracted from page")
-                page_text = response.choices[0].message.content.strip()
-                text_parts.append(page_text)
-
-            return "\n".join(text_parts)
+        # Read PDF bytes once; shared by the parser and the page renderer
+        file.seek(0)
+        pdf_bytes = file.read()
+        pdf_reader = PdfReader(BytesIO(pdf_bytes))
+
+        # First, try to extract text directly from each page
+        # Only pages without any text layer are scanned and need GPT Vision; short
+        # pages such as cover, signature or totals pages keep their own text
+        page_texts = [(page.extract_text() or "").strip() for page in pdf_reader.pages]
+        scanned_pages = [
+            page_number
+            for page_number, page_text in enumerate(page_texts, start=1)
+            if not page_text
+        ]
+        if not scanned_pages:
+            return "\n".join(page_texts)
 
+        try:
+            import pdf2image  # noqa: F401
         except ImportError:
             # If pdf2image is not installed, fall back to text extraction
+            all_text = [page_text for page_text in page_texts if page_text]
             if all_text:
                 return "\n".join(all_text)
             else:
@@ -192,6 +242,24 @@ def extract_text_from_pdf_gpt(file) -> str:
                     "brew install poppler (macOS)"
                 )
 
+        # Process scanned pages with GPT Vision in parallel; total latency is
+        # bounded by the slowest page instead of the sum of all pages
+        with ThreadPoolExecutor(
+            max_workers=min(VISION_MAX_WORKERS, len(scanned_pages))
+        ) as executor:
+            vision_texts = executor.map(
+                extract_text_from_scanned_page_gpt,
+                [pdf_bytes] * len(scanned_pages),
+                scanned_pages,
+            )
+            for page_number, page_text in zip(scanned_pages, vision_texts):
+                page_texts[page_number - 1] = page_text
+
+        # Blank pages legitimately have no text, but a document needs some
+        if not any(page_texts):
+            raise ValueError("No text extracted from PDF")
+        return "\n".join(page_text for page_text in page_texts if page_text)
+
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF using GPT: {str(e)}")
 
@@ -0,0 +1,82 @@
+"""
+Pydantic schemas for validating API request bodies and LLM extraction output.
+JSON is parsed and validated in a single pass with model_validate_json.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class SalesOrderUpdate(BaseModel):
+    """Editable sales order header fields. All fields are optional."""
+
+    SalesOrderID: Optional[int] = None
+    RevisionNumber: Optional[int] = None
+    OrderDate: Optional[datetime] = None
+    DueDate: Optional[datetime] = None
+    ShipDate: Optional[datetime] = None
+    Status: Optional[int] = None
+    OnlineOrderFlag: Optional[bool] = None
+    SalesOrderNumber: Optional[str] = None
+    PurchaseOrderNumber: Optional[str] = None
+    AccountNumber: Optional[str] = None
+    CustomerID: Optional[int] = None
+    SalesPersonID: Optional[int] = None
+    TerritoryID: Optional[int] = None
+    BillToAddressID: Optional[int] = None
+    ShipToAddressID: Optional[int] = None
+    ShipMethodID: Optional[int] = None
+    CreditCardID: Optional[int] = None
+    CreditCardApprovalCode: Optional[str] = None
+    CurrencyRateID: Optional[int] = None
+    SubTotal: Optional[float] = None
+    TaxAmt: Optional[float] = None
+    Freight: Optional[float] = None
+    TotalDue: Optional[float] = None
+
+
+class SalesOrderCreate(SalesOrderUpdate):
+    """Sales order header fields for creation. CustomerID and TerritoryID are required."""
+
+    CustomerID: int
+    TerritoryID: int
+
+
+class SalesOrderDetailUpdate(BaseModel):
+    """Editable sales order detail fields. All fields are optional."""
+
+    SalesOrderDetailID: Optional[int] = None
+    CarrierTrackingNumber: Optional[str] = None
+    OrderQty: Optional[int] = None
+    ProductID: Optional[int] = None
+    SpecialOfferID: Optional[int] = None
+    UnitPrice: Optional[float] = None
+    UnitPriceDiscount: Optional[float] = None
+    LineTotal: Optional[float] = None
+
+
+class SalesOrderDetailCreate(SalesOrderDetailUpdate):
+    """Sales order detail fields for creation. SalesOrderID and ProductID are required."""
+
+    SalesOrderID: int
+    ProductID: int
+
+
+class ExtractedInvoice(BaseModel):
+    """
+    Structured invoice data returned by the LLM extraction prompt.
+    The customer name comes first so structured outputs generate it before the
+    line items, letting a streaming caller match the customer early.
+    """
+
+    extracted_customer_name: Optional[str] = None
+    header: SalesOrderUpdate = Field(default_factory=SalesOrderUpdate)
+    line_items: list[SalesOrderDetailUpdate] = Field(default_factory=list)
+
+
+class ExtractedInvoiceGroup(BaseModel):
+    """Structured data of several invoices extracted in a single LLM request, in order."""
+
+    invoices: list[ExtractedInvoice]
@@ -0,0 +1,63 @@
+"""
+Celery background tasks for invoice extraction.
+Runs the OCR/LLM extraction pipeline outside of the Flask request cycle.
+"""
+
+import os
+
+from celery import Celery
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Broker and result backend connection strings
+# Can be overridden via environment variables CELERY_BROKER_URL and CELERY_RESULT_BACKEND
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+
+# Directory where the API spools uploads for the workers to pick up
+# Required: the API and the workers run as separate processes (see Procfile), which
+# on most hosts do not share the system temp directory
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER")
+if not UPLOAD_FOLDER:
+    raise ValueError(
+        "UPLOAD_FOLDER environment variable is required. "
+        "Set it to a directory shared by the API and the Celery workers."
+    )
+
+# Queue consumed by the OCR/LLM workers
+OCR_QUEUE = "ocr"
+
+celery_app = Celery("invoices", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_track_started=True,
+    task_routes={"tasks.extract_task": {"queue": OCR_QUEUE}},
+)
+
+
+@celery_app.task(bind=True)
+def extract_task(self, file_path: str, filename: str) -> dict:
+    """
+    Extract structured invoice data from an uploaded document.
+    The spooled upload is removed once processing finishes.
+
+    Args:
+        file_path: Path of the spooled upload in UPLOAD_FOLDER
+        filename: Original filename with extension
+
+    Returns:
+        dict: Extracted data with header and line_items
+    """
+    # Imported on first use so the Flask app, which only enqueues this task, does not
+    # load the OpenAI SDK, PIL and the PDF libraries
+    from openai_full_data_extraction import extract_invoice_data_from_document
+
+    try:
+        with open(file_path, "rb") as file:
+            return extract_invoice_data_from_document(file, filename)
+    finally:
+        os.remove(file_path)
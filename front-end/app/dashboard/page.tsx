@@ -11,8 +11,36 @@ import type {
   SalesOrderHeader,
   ExtractedData,
   SalesOrderFormData,
+  UploadJobResponse,
+  JobStatusResponse,
 } from "@/lib/types"
 
+// Interval between polls of the extraction job status
+const JOB_POLL_INTERVAL_MS = 1000
+
+/**
+ * Poll an extraction job until it finishes and return its result
+ */
+async function waitForExtraction(jobId: string): Promise<ExtractedData> {
+  while (true) {
+    const response = await fetch(API_ENDPOINTS.JOB_BY_ID(jobId))
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({ description: "Processing failed" }))
+      throw new Error(errorData.description || "Failed to process file")
+    }
+
+    if (response.status === 200) {
+      const job: JobStatusResponse = await response.json()
+      if (job.result) {
+        return job.result
+      }
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+  }
+}
+
 export default function Dashboard() {
   const [error, setError] = useState<string | null>(null)
   const [uploading, setUploading] = useState(false)
@@ -48,7 +76,8 @@ export default function Dashboard() {
         throw new Error(errorData.description || "Failed to upload file")
       }
 
-      const extractedData: ExtractedData = await response.json()
+      const job: UploadJobResponse = await response.json()
+      const extractedData = await waitForExtraction(job.job_id)
       console.log(extractedData)
 
       // Set form data and open sheet
@@ -18,6 +18,7 @@ export const API_ENDPOINTS = {
   
   // Upload
   UPLOAD: `${API_BASE_URL}/upload`,
+  JOB_BY_ID: (jobId: string) => `${API_BASE_URL}/jobs/${jobId}`,
   
   // Customers
   CUSTOMERS_SEARCH: (query: string, limit: number = 20) => 
@@ -11,6 +11,24 @@
 
 /**
  * Response from POST /upload
+ * Job handle for the queued extraction task
+ */
+export interface UploadJobResponse {
+  job_id: string
+  status: string
+}
+
+/**
+ * Response from GET /jobs/:id
+ * Result is present once the extraction task has finished
+ */
+export interface JobStatusResponse {
+  job_id: string
+  status: string
+  result?: ExtractedData
+}
+
+/**
  * Extracted invoice data from document upload
  */
 export interface ExtractedData {